@@ -4,24 +4,66 @@ Test client for MCP Streamable HTTP endpoint
 Connects to /mcp endpoint and lists tools
 """
 import asyncio
-import json
+import itertools
+import logging
+import os
+from typing import ClassVar
 import httpx
+import orjson
+
+
+logger = logging.getLogger("client_test")
+
+
+INITIALIZE_PARAMS = {
+    "protocolVersion": "2025-06-18",
+    "capabilities": {},
+    "clientInfo": {
+        "name": "streamable-http-test-client",
+        "version": "1.0.0"
+    }
+}
+
+# Number of tools to call concurrently in the tool call step
+TOOL_CALL_COUNT = int(os.environ.get("TOOL_CALL_COUNT", "1"))
 
 
 class StreamableHTTPClient:
     """Simple MCP client using Streamable HTTP transport"""
     
+    _JSON_HEADERS: ClassVar[dict[str, str]] = {"Content-Type": "application/json"}
+    
     def __init__(self, base_url: str):
         self.base_url = base_url
-        self.request_id = 0
+        # Monotonic JSON-RPC request IDs starting at 1
+        self._next_id = itertools.count(1).__next__
+        self._client: httpx.AsyncClient | None = None
     
-    def _next_id(self) -> int:
-        """Get next request ID"""
-        self.request_id += 1
-        return self.request_id
+    async def __aenter__(self) -> "StreamableHTTPClient":
+        return self
     
-    async def _send_request(self, method: str, params: dict = None) -> dict:
-        """Send a JSON-RPC request"""
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use so connections are reused"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                headers=self._JSON_HEADERS,
+                limits=httpx.Limits(max_keepalive_connections=4, max_connections=8),
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _build_request(self, method: str, params: dict = None) -> dict:
+        """Build a JSON-RPC request object"""
         request = {
             "jsonrpc": "2.0",
             "id": self._next_id(),
@@ -29,37 +71,54 @@ class StreamableHTTPClient:
         }
         if params:
             request["params"] = params
+        return request
+    
+    async def _send(self, payload):
+        """POST a JSON-RPC request object or batch and return the decoded response"""
+        response = await self.client.post(self.base_url, content=orjson.dumps(payload))
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def _send_request(self, method: str, params: dict = None) -> dict:
+        """Send a JSON-RPC request"""
+        request = self._build_request(method, params)
         
-        print(f"\n→ Sending {method}...")
-        print(f"  Request: {json.dumps(request, indent=2)}")
+        logger.debug("→ Sending %s request=%s", method, request)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.base_url,
-                json=request,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            print(f"← Received response")
-            print(f"  Response: {json.dumps(result, indent=2)}")
-            
-            return result
+        result = await self._send(request)
+        logger.debug("← Received response=%s", result)
+        
+        return result
+    
+    async def send_batch(self, calls: list[tuple[str, dict | None]]) -> list[dict]:
+        """
+        Send several JSON-RPC requests as a single batch.
+        Responses are returned in the same order as the calls. Falls back to
+        one request per call if the server doesn't support batching.
+        """
+        requests = [self._build_request(method, params) for method, params in calls]
+        
+        logger.debug("→ Sending batch request=%s", requests)
+        
+        try:
+            result = await self._send(requests)
+        except httpx.HTTPStatusError as e:
+            logger.info("← Batch rejected (%s), sending requests individually", e.response.status_code)
+            result = None
+        
+        if not isinstance(result, list):
+            if result is not None:
+                logger.info("← Batch not supported, sending requests individually")
+            return [await self._send_request(method, params) for method, params in calls]
+        
+        logger.debug("← Received batch response=%s", result)
+        
+        responses_by_id = {response.get("id"): response for response in result}
+        return [responses_by_id.get(request["id"], {}) for request in requests]
     
     async def initialize(self) -> dict:
         """Initialize the MCP session"""
-        return await self._send_request(
-            "initialize",
-            {
-                "protocolVersion": "2025-06-18",
-                "capabilities": {},
-                "clientInfo": {
-                    "name": "streamable-http-test-client",
-                    "version": "1.0.0"
-                }
-            }
-        )
+        return await self._send_request("initialize", INITIALIZE_PARAMS)
     
     async def list_tools(self) -> dict:
         """List available tools"""
@@ -86,55 +145,66 @@ async def main():
     client = StreamableHTTPClient("http://localhost:8000/mcp")
     
     try:
-        # Step 1: Initialize
-        print("\n[Step 1] Initializing connection...")
-        init_result = await client.initialize()
+        # Steps 1 & 2: Initialize and list tools in a single batched round-trip
+        print("\n[Step 1] Initializing connection and listing tools...")
+        init_result, tools_result = await client.send_batch([
+            ("initialize", INITIALIZE_PARAMS),
+            ("tools/list", None),
+        ])
         
-        if "error" in init_result:
-            print(f"\n❌ Initialization failed: {init_result['error']}")
-            return
+        match init_result:
+            case {"error": error}:
+                print(f"\n❌ Initialization failed: {error}")
+                return
+            case {"result": {"serverInfo": dict() as server_info}}:
+                pass
+            case _:
+                server_info = {}
         
-        server_info = init_result.get("result", {}).get("serverInfo", {})
         print(f"\n✅ Connected to: {server_info.get('name', 'Unknown')}")
         print(f"   Version: {server_info.get('version', 'Unknown')}")
         
-        # Step 2: List tools
-        print("\n[Step 2] Listing available tools...")
-        tools_result = await client.list_tools()
+        match tools_result:
+            case {"error": error}:
+                print(f"\n❌ Failed to list tools: {error}")
+                return
+            case {"result": {"tools": list() as tools}}:
+                pass
+            case _:
+                tools = []
         
-        if "error" in tools_result:
-            print(f"\n❌ Failed to list tools: {tools_result['error']}")
-            return
-        
-        tools = tools_result.get("result", {}).get("tools", [])
         print(f"\n✅ Found {len(tools)} tools:")
         for i, tool in enumerate(tools, 1):
             print(f"   {i}. {tool.get('name')}")
             if tool.get('description'):
                 print(f"      {tool.get('description')}")
         
-        # Step 3: Call a tool (if available)
+        # Step 2: Call a tool (if available)
         if tools:
-            print("\n[Step 3] Testing tool call...")
-            first_tool = tools[0]
-            tool_name = first_tool.get("name")
-            print(f"   Calling: {tool_name}")
+            print("\n[Step 2] Testing tool call...")
+            test_tools = tools[:TOOL_CALL_COUNT]
+            tool_names = [tool.get("name") for tool in test_tools]
+            print(f"   Calling: {', '.join(tool_names)}")
+            
+            # Call with empty arguments (or adapt based on the tool), all tools concurrently
+            call_results = await asyncio.gather(
+                *(client.call_tool(tool_name, {}) for tool_name in tool_names),
+                return_exceptions=True
+            )
             
-            try:
-                # Call with empty arguments (or adapt based on the tool)
-                call_result = await client.call_tool(tool_name, {})
-                
-                if "error" in call_result:
-                    print(f"\n⚠️  Tool call returned error: {call_result['error']}")
-                else:
-                    print(f"\n✅ Tool call successful!")
-                    content = call_result.get("result", {}).get("content", [])
-                    if content:
-                        print(f"   Response content:")
-                        for item in content[:3]:  # Show first 3 items
-                            print(f"   - {item}")
-            except Exception as e:
-                print(f"\n⚠️  Tool call failed: {e}")
+            for tool_name, call_result in zip(tool_names, call_results):
+                match call_result:
+                    case Exception():
+                        print(f"\n⚠️  Tool call {tool_name} failed: {call_result}")
+                    case {"error": error}:
+                        print(f"\n⚠️  Tool call {tool_name} returned error: {error}")
+                    case _:
+                        print(f"\n✅ Tool call {tool_name} successful!")
+                        match call_result:
+                            case {"result": {"content": [_, *_] as content}}:
+                                print(f"   Response content:")
+                                for item in content[:3]:  # Show first 3 items
+                                    print(f"   - {item}")
         
         print("\n" + "=" * 60)
         print("✅ Test completed successfully!")
@@ -146,8 +216,17 @@ async def main():
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await client.aclose()
 
 
 if __name__ == "__main__":
+    try:
+        # Use uvloop's faster event loop when it's installed
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"), format="%(message)s")
     asyncio.run(main())
 
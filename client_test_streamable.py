@@ -129,5 +129,11 @@ async def main():
 
 
 if __name__ == "__main__":
+    try:
+        # Use uvloop's faster event loop when it's installed
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
 
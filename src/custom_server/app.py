@@ -4,15 +4,19 @@ Proxies requests to an upstream MCP server with U2M OAuth authentication
 """
 from pathlib import Path
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import httpx
+import hashlib
 import os
-from contextlib import asynccontextmanager
-from typing import Dict
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
 
-from .oauth_manager import OAuthManager
+from .oauth_manager import OAuthManager, OAuthManagerStore, REFRESH_BUFFER_SECONDS
 from .auth import register_auth_routes
 from .proxy import register_proxy_routes
+from .mcp_bridge_v2 import mcp_bridge_v2
 from .logger import logger
 
 
@@ -26,11 +30,29 @@ CALLBACK_PORT = int(os.getenv("OAUTH_CALLBACK_PORT", "8000"))
 
 # OAuth redirect URL (for deployed environments)
 # Format: https://your-app-url.com/oauth/callback
-#OAUTH_REDIRECT_URL = f"{os.getenv("DATABRICKS_APP_URL", "http://localhost:8000")}/oauth/callback"
-OAUTH_REDIRECT_URL = "https://mcp-u2m-proxy-1444828305810485.aws.databricksapps.com/oauth/callback"
-print(f"OAUTH_REDIRECT_URL: {OAUTH_REDIRECT_URL}")
-# Per-user OAuth managers
-oauth_managers: Dict[str, OAuthManager] = {}
+# When unset, it is derived from the first auth request's URL
+OAUTH_REDIRECT_URL = os.getenv("OAUTH_REDIRECT_URL") or None
+logger.info("OAUTH_REDIRECT_URL: %s", OAUTH_REDIRECT_URL or "(derived from request)")
+# Hosts a request-derived redirect URL may point at; others fall back to localhost,
+# since the request's Host header is client-controlled
+OAUTH_REDIRECT_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("OAUTH_REDIRECT_HOSTS", "localhost,127.0.0.1").split(",") if host.strip()
+)
+# Maximum number of per-user OAuth managers kept in memory
+MAX_USERS = int(os.getenv("MAX_USERS", "1024"))
+# Seconds a user's OAuth manager may sit unused before it is dropped from memory
+USER_IDLE_TTL = float(os.getenv("USER_IDLE_TTL", "3600"))
+# Maximum number of SSE streams proxied upstream at once; further clients wait for a slot
+MAX_SSE_STREAMS = int(os.getenv("MAX_SSE_STREAMS", "128"))
+# How often (seconds) cached OAuth managers are checked for tokens about to expire
+TOKEN_REFRESH_INTERVAL = 30
+# Comma-separated user IDs whose saved tokens and client info are loaded at startup
+PRELOAD_USERS = [user_id.strip() for user_id in os.getenv("PRELOAD_USERS", "").split(",") if user_id.strip()]
+
+
+# User ID used when no X-Forwarded-User header is present
+DEFAULT_USER_ID = "default"
+_USER_HEADER = b"x-forwarded-user"
 
 
 def get_user_id_from_request(request: Request) -> str:
@@ -38,50 +60,122 @@ def get_user_id_from_request(request: Request) -> str:
     Extract user ID from request headers.
     Uses X-Forwarded-User header if present, otherwise returns 'default'
     """
-    user_id = request.headers.get("X-Forwarded-User", "default")
-    if user_id != "default":
-        logger.debug(f"Request from user: {user_id}")
-    return user_id
+    # Scan the raw ASGI headers (names are already lowercased) rather than
+    # building Starlette's case-insensitive Headers wrapper
+    for name, value in request.scope["headers"]:
+        if name == _USER_HEADER:
+            user_id = value.decode("latin-1")
+            logger.debug("Request from user: %s", user_id)
+            return user_id
+    return DEFAULT_USER_ID
+
+
+# Shared by every user's OAuthManager so discovery, registration and token
+# refreshes reuse open connections to the authorization server
+oauth_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(30.0),
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+)
+
+
+def _create_oauth_manager(user_id: str) -> OAuthManager:
+    """Create an OAuthManager for a user"""
+    logger.info("Creating new OAuthManager for user: %s", user_id)
+    return OAuthManager(
+        server_url=UPSTREAM_MCP_URL,
+        callback_port=CALLBACK_PORT,
+        client_name="MCP Databricks Proxy",
+        user_id=user_id,
+        redirect_url=OAUTH_REDIRECT_URL,
+        http_client=oauth_client
+    )
+
+
+# Per-user OAuth managers
+oauth_managers = OAuthManagerStore(_create_oauth_manager, maxsize=MAX_USERS, idle_ttl=USER_IDLE_TTL)
 
 
 def get_oauth_manager(user_id: str) -> OAuthManager:
     """
     Get or create an OAuthManager instance for the given user.
-    Caches instances to avoid recreating them.
+    Caches up to MAX_USERS instances (each for up to USER_IDLE_TTL seconds
+    of inactivity) to avoid recreating them; an evicted manager is rebuilt from the tokens and auth state persisted on disk.
     """
-    if user_id not in oauth_managers:
-        logger.info(f"Creating new OAuthManager for user: {user_id}")
-        oauth_managers[user_id] = OAuthManager(
-            server_url=UPSTREAM_MCP_URL,
-            callback_port=CALLBACK_PORT,
-            client_name="MCP Databricks Proxy",
-            user_id=user_id,
-            redirect_url=OAUTH_REDIRECT_URL
-        )
-    return oauth_managers[user_id]
+    return oauth_managers.get_or_create(user_id)
+
+
+async def _refresh_tokens_loop() -> None:
+    """Proactively refresh users' access tokens before they expire, off the request path"""
+    while True:
+        await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
+        for manager in oauth_managers.snapshot():
+            try:
+                # Refresh before request handlers would have to do it inline
+                if await manager.refresh_if_expiring(REFRESH_BUFFER_SECONDS + TOKEN_REFRESH_INTERVAL):
+                    logger.debug("Background token refresh completed for user: %s", manager.user_id)
+            except Exception as e:
+                logger.warning("Background token refresh failed for user %s: %s", manager.user_id, e)
+
+
+# Shared connection pool for all proxied upstream requests
+upstream_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=64, max_connections=256),
+)
+
+# Separate pool for long-lived SSE streams so open streams can't exhaust the
+# connections needed by short proxied requests
+sse_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(None, connect=10.0),
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=None),
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize the proxy server"""
-    print("\nInitializing MCP Proxy Server...")
-    print(f"Upstream MCP Server: {UPSTREAM_MCP_URL}")
-    print(f"OAuth Callback Port: {CALLBACK_PORT}")
-    print(f"Multi-user support: enabled (via X-Forwarded-User header)\n")
+    logger.info("Initializing MCP Proxy Server...")
+    logger.info("Upstream MCP Server: %s", UPSTREAM_MCP_URL)
+    logger.info("OAuth Callback Port: %s", CALLBACK_PORT)
+    logger.info("Multi-user support: enabled (via X-Forwarded-User header)")
     
-    # Register auth and proxy routes with user management functions
-    register_auth_routes(app, get_user_id_from_request, get_oauth_manager, UPSTREAM_MCP_URL)
-    register_proxy_routes(app, get_user_id_from_request, get_oauth_manager, UPSTREAM_MCP_URL)
+    # Load the web UI once so serving it doesn't touch the filesystem
+    app.state.index_bytes = (STATIC_DIR / "index.html").read_bytes()
+    app.state.index_etag = f'"{hashlib.blake2b(app.state.index_bytes, digest_size=16).hexdigest()}"'
     
-    yield
+    # Load known users' tokens and client info from disk before serving requests,
+    # so their first requests are served from memory
+    if PRELOAD_USERS:
+        await asyncio.gather(*(get_oauth_manager(user_id).preload() for user_id in PRELOAD_USERS))
+        logger.info("Preloaded OAuth managers for %d user(s)", len(PRELOAD_USERS))
+    
+    refresh_task = asyncio.create_task(_refresh_tokens_loop())
+    bridge_sweep_task = asyncio.create_task(mcp_bridge_v2.close_idle_sessions_loop())
+    
+    try:
+        yield
+    finally:
+        refresh_task.cancel()
+        bridge_sweep_task.cancel()
+        # Let a refresh in progress unwind before the managers and clients it uses close
+        with suppress(asyncio.CancelledError):
+            await refresh_task
+        with suppress(asyncio.CancelledError):
+            await bridge_sweep_task
+        # Flush token saves still being written in the background
+        await asyncio.gather(*(manager.close() for manager in oauth_managers.snapshot()))
+        await upstream_client.aclose()
+        await sse_client.aclose()
+        await oauth_client.aclose()
+        await mcp_bridge_v2.aclose()
     
     # Cleanup
-    print("\nShutting down MCP Proxy Server...")
-    print(f"Served {len(oauth_managers)} unique user(s)")
+    logger.info("Shutting down MCP Proxy Server...")
+    logger.info("Served %d cached user(s)", len(oauth_managers))
 
 
 # Create FastAPI app
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable CORS with wildcard
 app.add_middleware(
@@ -93,7 +187,27 @@ app.add_middleware(
 )
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires for it)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 @app.get("/", include_in_schema=False)
-async def serve_index():
-    """Serve the main web UI"""
-    return FileResponse(STATIC_DIR / "index.html")
+async def serve_index(request: Request):
+    """Serve the main web UI (cached in memory at startup)"""
+    etag = request.app.state.index_etag
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=request.app.state.index_bytes, media_type="text/html", headers=headers)
+
+
+# Register auth and proxy routes at import time (the proxy's catch-all route must come last)
+register_auth_routes(app, get_user_id_from_request, get_oauth_manager, UPSTREAM_MCP_URL, OAUTH_REDIRECT_HOSTS)
+register_proxy_routes(app, get_user_id_from_request, get_oauth_manager, UPSTREAM_MCP_URL, upstream_client, sse_client, MAX_SSE_STREAMS)
@@ -1,31 +1,60 @@
 """
 Authentication endpoints and helpers for the MCP proxy server
 """
+import asyncio
+
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
-from urllib.parse import parse_qs
 
 from .templates import oauth_success_template, oauth_error_template
 from .logger import logger
 
 
+AUTH_REQUIRED_DETAIL = "Authentication required. Please visit http://localhost:8000/ to authenticate."
+
+
+def _resolve_callback_user_id(header_user_id: str, state) -> str:
+    """
+    Resolve the user an OAuth callback belongs to.
+    Without an X-Forwarded-User header, fall back to the user encoded in the
+    state parameter ("state_value|user_id"), parsed in a single pass.
+    """
+    if header_user_id != "default" or not state:
+        return header_user_id
+    _, sep, state_user_id = state.rpartition("|")
+    if not sep:
+        return header_user_id
+    logger.debug("Extracted user_id from state: %s", state_user_id)
+    return state_user_id
+
+
 async def check_auth_status(oauth_manager):
     """Check if authentication is valid"""
-    if not oauth_manager:
-        return False
-    
-    tokens = oauth_manager.load_tokens()
-    if not tokens:
+    # No tokens in memory or on disk: unauthenticated, without raising through
+    # get_valid_access_token
+    if not oauth_manager or not (oauth_manager.tokens or await oauth_manager.load_tokens_async()):
         return False
     
     try:
+        # Served from the manager's in-memory token cache while the token is fresh
         await oauth_manager.get_valid_access_token()
         return True
     except Exception:
         return False
 
 
-def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url: str):
+async def require_access_token(oauth_manager) -> str:
+    """Get a valid access token for proxying, or raise a 401 if not authenticated"""
+    if not oauth_manager or not (oauth_manager.tokens or await oauth_manager.load_tokens_async()):
+        raise HTTPException(status_code=401, detail=AUTH_REQUIRED_DETAIL)
+    
+    try:
+        return await oauth_manager.get_valid_access_token()
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Authentication required: {e}")
+
+
+def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url: str, trusted_redirect_hosts: frozenset):
     """Register authentication routes on the FastAPI app"""
     
     @app.get("/api/auth/status")
@@ -43,8 +72,8 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
         }
         
         if is_authenticated:
-            tokens = oauth_manager.load_tokens()
-            client_info = oauth_manager.load_client_info()
+            tokens = oauth_manager.tokens
+            client_info = oauth_manager.client_info or await asyncio.to_thread(oauth_manager.load_client_info)
             response["client_id"] = client_info.get("client_id") if client_info else None
             response["expires_at"] = tokens.get("expires_at") if tokens else None
         
@@ -56,6 +85,7 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
         """Start OAuth authentication flow"""
         user_id = get_user_id_fn(request)
         oauth_manager = get_oauth_manager_fn(user_id)
+        oauth_manager.resolve_redirect_url(str(request.url_for("oauth_callback")), trusted_redirect_hosts)
         
         try:
             # Register client if needed
@@ -64,8 +94,8 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
             # Start auth flow
             auth_url = await oauth_manager.start_auth_flow()
             
-            logger.info(f"Authentication initiated from web UI for user: {user_id}")
-            logger.debug(f"Authorization URL: {auth_url}")
+            logger.info("Authentication initiated from web UI for user: %s", user_id)
+            logger.debug("Authorization URL: %s", auth_url)
             
             return {
                 "success": True,
@@ -74,7 +104,7 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
                 "user_id": user_id
             }
         except Exception as e:
-            logger.error(f"Error starting auth for user {user_id}: {e}")
+            logger.error("Error starting auth for user %s: %s", user_id, e)
             return {
                 "success": False,
                 "error": str(e)
@@ -88,8 +118,8 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
         oauth_manager = get_oauth_manager_fn(user_id)
         
         try:
-            oauth_manager.clear_credentials()
-            logger.info(f"Credentials cleared from web UI for user: {user_id}")
+            await oauth_manager.clear_credentials()
+            logger.info("Credentials cleared from web UI for user: %s", user_id)
             return {
                 "success": True,
                 "message": "Credentials cleared successfully",
@@ -105,23 +135,14 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
     @app.get("/oauth/callback", include_in_schema=False)
     async def oauth_callback(request: Request):
         """Handle OAuth callback"""
-        user_id = get_user_id_fn(request)
-        
-        # Try to get user_id from state parameter if not in headers
-        query_string = str(request.url).split("?", 1)[1] if "?" in str(request.url) else ""
-        query_params = parse_qs(query_string)
-        
-        # If user_id is 'default' (no header), try to get it from state
-        # The state format could be: "state_value|user_id"
-        if user_id == "default" and "state" in query_params:
-            state = query_params["state"][0]
-            if "|" in state:
-                # Extract user_id from state
-                _, state_user_id = state.rsplit("|", 1)
-                user_id = state_user_id
-                logger.debug(f"Extracted user_id from state: {user_id}")
+        # Use the query parameters Starlette has already parsed
+        query_params = request.query_params
+        user_id = _resolve_callback_user_id(get_user_id_fn(request), query_params.get("state"))
         
         oauth_manager = get_oauth_manager_fn(user_id)
+        oauth_manager.resolve_redirect_url(str(request.url_for("oauth_callback")), trusted_redirect_hosts)
+        # The flow may have been started by another worker: read its saved state off the loop
+        await oauth_manager.prepare_auth_state()
         result = oauth_manager.handle_callback(query_params)
         
         # If successful, exchange code for tokens
@@ -129,9 +150,9 @@ def register_auth_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url
             try:
                 code = oauth_manager.auth_code
                 await oauth_manager.exchange_code_for_tokens(code)
-                logger.info(f"OAuth authentication completed successfully for user: {user_id}")
+                logger.info("OAuth authentication completed successfully for user: %s", user_id)
             except Exception as e:
-                logger.error(f"Failed to exchange code for tokens for user {user_id}: {e}")
+                logger.error("Failed to exchange code for tokens for user %s: %s", user_id, e)
                 result = {
                     "status": "error",
                     "message": f"Failed to complete authentication: {e}"
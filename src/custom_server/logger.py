@@ -6,6 +6,23 @@ import os
 import sys
 
 
+class _CachedTimeFormatter(logging.Formatter):
+    """Formatter that renders each second's timestamp once instead of per record"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last_second = None
+        self._last_time = ""
+    
+    def formatTime(self, record: logging.LogRecord, datefmt=None) -> str:
+        # datefmt has no sub-second fields, so records within a second share a timestamp
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_time = super().formatTime(record, datefmt)
+            self._last_second = second
+        return self._last_time
+
+
 def setup_logging() -> logging.Logger:
     """
     Set up logging for the application.
@@ -30,7 +47,7 @@ def setup_logging() -> logging.Logger:
     handler.setLevel(log_level)
     
     # Create formatter
-    formatter = logging.Formatter(
+    formatter = _CachedTimeFormatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
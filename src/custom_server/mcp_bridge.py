@@ -11,6 +11,7 @@ from mcp import ClientSession, types
 from mcp.client.sse import sse_client
 
 from .logger import logger
+from .mcp_dispatch import METHOD_DISPATCH, method_not_found
 
 
 class MCPBridge:
@@ -18,63 +19,100 @@ class MCPBridge:
     
     def __init__(self):
         self.sessions: Dict[str, ClientSession] = {}
-        self.session_locks: Dict[str, asyncio.Lock] = {}
+        self.session_futures: Dict[str, asyncio.Future] = {}  # In-progress connections
         self.session_contexts: Dict[str, Any] = {}  # Keep SSE contexts alive
+        self.session_streams: Dict[str, tuple] = {}  # (read, write) streams, to check liveness
     
     async def get_session(self, user_id: str, upstream_url: str, access_token: str) -> ClientSession:
         """Get or create an MCP client session for a user"""
-        if user_id not in self.session_locks:
-            self.session_locks[user_id] = asyncio.Lock()
-        
-        async with self.session_locks[user_id]:
-            # Check if we have a valid session
-            if user_id in self.sessions:
-                # TODO: Check if session is still alive
+        # Check if we have a valid session
+        if user_id in self.sessions:
+            if self._session_alive(user_id):
                 return self.sessions[user_id]
-            
-            # Create new session
-            logger.info(f"Creating new MCP session for user: {user_id}")
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}"
-            }
-            
-            # Construct SSE endpoint URL (handle if /sse already in URL)
-            if upstream_url.endswith("/sse"):
-                sse_endpoint = upstream_url
-            else:
-                sse_endpoint = f"{upstream_url}/sse"
-            logger.debug(f"[Bridge] Connecting to SSE endpoint: {sse_endpoint}")
-            logger.debug(f"[Bridge] Auth header: Bearer {access_token[:20]}...")
-            
-            # Connect via SSE - manually enter context to keep it alive
+            logger.info("MCP session for user %s has closed, reconnecting", user_id)
+            await self.close_session(user_id)
+        
+        # Another request is already connecting for this user: wait for its result
+        # instead of queueing behind it for the whole SSE handshake
+        while (pending := self.session_futures.get(user_id)) is not None:
             try:
-                logger.debug("[Bridge] Creating SSE context...")
-                sse_context = sse_client(sse_endpoint, headers=headers)
-                
-                logger.debug("[Bridge] Entering SSE context (this may take a moment)...")
-                read, write = await asyncio.wait_for(
-                    sse_context.__aenter__(),
-                    timeout=10.0
-                )
-                logger.debug("[Bridge] SSE context entered successfully")
-                
-                # Create MCP session
-                logger.debug("[Bridge] Creating ClientSession...")
-                session = ClientSession(read, write)
-                logger.info(f"[Bridge] MCP session created for user {user_id} (not yet initialized)")
-            except asyncio.TimeoutError as e:
-                logger.error(f"[Bridge] Timeout while establishing connection or initializing: {e}")
-                raise Exception("Timeout connecting to upstream SSE server") from e
-            except Exception as e:
-                logger.error(f"[Bridge] Error establishing connection: {e}")
-                raise
-            
-            # Store both session and context to keep connection alive
-            self.sessions[user_id] = session
-            self.session_contexts[user_id] = sse_context
-            
-            return session
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only this request's own cancellation propagates; if the connecting
+                # request was cancelled instead, start the connect again here
+                if asyncio.current_task().cancelling() or not pending.cancelled():
+                    raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self.session_futures[user_id] = future
+        try:
+            session, streams, sse_context = await self._connect(user_id, upstream_url, access_token)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case no other request was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self.session_futures[user_id]
+        
+        # Store both session and context to keep connection alive
+        self.sessions[user_id] = session
+        self.session_streams[user_id] = streams
+        self.session_contexts[user_id] = sse_context
+        future.set_result(session)
+        
+        return session
+    
+    def _session_alive(self, user_id: str) -> bool:
+        """Whether the user's SSE connection is still open in both directions"""
+        read, write = self.session_streams[user_id]
+        # sse_client closes its ends of the streams once its SSE reader or POST writer stops
+        return read.statistics().open_send_streams > 0 and write.statistics().open_receive_streams > 0
+    
+    async def _connect(self, user_id: str, upstream_url: str, access_token: str):
+        """Open the upstream SSE connection and create the user's ClientSession"""
+        # Create new session
+        logger.info("Creating new MCP session for user: %s", user_id)
+        
+        headers = {
+            "Authorization": f"Bearer {access_token}"
+        }
+        
+        # Construct SSE endpoint URL (handle if /sse already in URL)
+        if upstream_url.endswith("/sse"):
+            sse_endpoint = upstream_url
+        else:
+            sse_endpoint = f"{upstream_url}/sse"
+        logger.debug("[Bridge] Connecting to SSE endpoint: %s", sse_endpoint)
+        logger.debug("[Bridge] Auth header: Bearer %s...", access_token[:20])
+        
+        # Connect via SSE - manually enter context to keep it alive
+        try:
+            logger.debug("[Bridge] Creating SSE context...")
+            sse_context = sse_client(sse_endpoint, headers=headers)
+            
+            logger.debug("[Bridge] Entering SSE context (this may take a moment)...")
+            read, write = await asyncio.wait_for(
+                sse_context.__aenter__(),
+                timeout=10.0
+            )
+            logger.debug("[Bridge] SSE context entered successfully")
+            
+            # Create MCP session
+            logger.debug("[Bridge] Creating ClientSession...")
+            session = ClientSession(read, write)
+            logger.info("[Bridge] MCP session created for user %s (not yet initialized)", user_id)
+        except asyncio.TimeoutError as e:
+            logger.error("[Bridge] Timeout while establishing connection or initializing: %s", e)
+            raise Exception("Timeout connecting to upstream SSE server") from e
+        except Exception as e:
+            logger.error("[Bridge] Error establishing connection: %s", e)
+            raise
+        
+        return session, (read, write), sse_context
     
     async def close_session(self, user_id: str):
         """Close a user's MCP session"""
@@ -86,9 +124,15 @@ class MCPBridge:
                     del self.session_contexts[user_id]
                 
                 del self.sessions[user_id]
-                logger.info(f"Closed MCP session for user: {user_id}")
+                self.session_streams.pop(user_id, None)
+                logger.info("Closed MCP session for user: %s", user_id)
             except Exception as e:
-                logger.error(f"Error closing session for user {user_id}: {e}")
+                logger.error("Error closing session for user %s: %s", user_id, e)
+    
+    async def aclose(self):
+        """Close all MCP sessions (e.g. on server shutdown)"""
+        for user_id in list(self.sessions):
+            await self.close_session(user_id)
     
     async def handle_request(
         self, 
@@ -107,71 +151,17 @@ class MCPBridge:
             
             params = json_rpc_request.get("params", {})
             
-            logger.debug(f"[Bridge] Handling {method} for user {user_id}")
+            logger.debug("[Bridge] Handling %s for user %s", method, user_id)
             
             # Route to appropriate MCP method (with timeout)
-            if method == "initialize":
-                logger.debug(f"[Bridge] Calling session.initialize()...")
-                result = await asyncio.wait_for(session.initialize(), timeout=30.0)
-                logger.debug(f"[Bridge] Initialize complete")
-                response_data = {
-                    "protocolVersion": result.protocol_version,
-                    "capabilities": result.capabilities.model_dump() if result.capabilities else {},
-                    "serverInfo": result.server_info.model_dump()
-                }
-            
-            elif method == "tools/list":
-                result = await asyncio.wait_for(session.list_tools(), timeout=30.0)
-                response_data = {
-                    "tools": [tool.model_dump() for tool in result.tools]
-                }
-            
-            elif method == "tools/call":
-                tool_name = params.get("name")
-                arguments = params.get("arguments", {})
-                result = await asyncio.wait_for(session.call_tool(tool_name, arguments), timeout=60.0)
-                response_data = {
-                    "content": [item.model_dump() for item in result.content],
-                    "isError": result.isError if hasattr(result, "isError") else False
-                }
-            
-            elif method == "resources/list":
-                result = await asyncio.wait_for(session.list_resources(), timeout=30.0)
-                response_data = {
-                    "resources": [resource.model_dump() for resource in result.resources]
-                }
-            
-            elif method == "resources/read":
-                uri = params.get("uri")
-                result = await asyncio.wait_for(session.read_resource(uri), timeout=30.0)
-                response_data = {
-                    "contents": [content.model_dump() for content in result.contents]
-                }
-            
-            elif method == "prompts/list":
-                result = await asyncio.wait_for(session.list_prompts(), timeout=30.0)
-                response_data = {
-                    "prompts": [prompt.model_dump() for prompt in result.prompts]
-                }
-            
-            elif method == "prompts/get":
-                prompt_name = params.get("name")
-                arguments = params.get("arguments", {})
-                result = await asyncio.wait_for(session.get_prompt(prompt_name, arguments), timeout=30.0)
-                response_data = {
-                    "messages": [msg.model_dump() for msg in result.messages]
-                }
-            
-            else:
-                logger.warning(f"[Bridge] Unsupported method: {method}")
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32601,
-                        "message": f"Method not found: {method}"
-                    }
-                }
+            entry = METHOD_DISPATCH.get(method)
+            if entry is None:
+                logger.warning("[Bridge] Unsupported method: %s", method)
+                return method_not_found(request_id, method)
+            session_method, timeout, get_args, build_result = entry
+            async with asyncio.timeout(timeout):
+                result = await getattr(session, session_method)(*get_args(params))
+            response_data = build_result(result)
             
             # Success response
             return {
@@ -181,7 +171,7 @@ class MCPBridge:
             }
         
         except Exception as e:
-            logger.error(f"[Bridge] Error handling {method}: {e}")
+            logger.error("[Bridge] Error handling %s: %s", method, e)
             return {
                 "jsonrpc": "2.0",
                 "id": json_rpc_request.get("id"),
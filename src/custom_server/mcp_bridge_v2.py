@@ -3,23 +3,308 @@ MCP Protocol Bridge V2
 Properly uses MCP SDK with async context managers
 """
 import asyncio
-import json
+import functools
+import hashlib
+from collections import OrderedDict
+import logging
+import time
 from typing import Dict, Any, Optional
-from contextlib import asynccontextmanager
 
-from mcp import ClientSession
+from mcp import ClientSession, types
 from mcp.client.sse import sse_client
+import httpx
+import orjson
 
 from .logger import logger
+from .mcp_dispatch import METHOD_DISPATCH, initialize_result, method_not_found
+
+
+# Seconds an unused upstream session is kept open before it is closed
+SESSION_IDLE_TTL = 300.0
+# How often (seconds) idle upstream sessions are looked for
+SESSION_SWEEP_INTERVAL = 60.0
+
+# Argument-free list methods: concurrent identical calls on a session share one upstream call,
+# and results are reused for RESULT_CACHE_TTL seconds since they rarely change
+COALESCED_METHODS = frozenset({"tools/list", "resources/list", "prompts/list"})
+RESULT_CACHE_TTL = 60.0
+RESULT_CACHE_MAX_ENTRIES = 1024
+
+
+@functools.lru_cache(maxsize=64)
+def _sse_endpoint(upstream_url: str) -> str:
+    """Upstream SSE endpoint URL (handles /sse already being in the URL)"""
+    if upstream_url.endswith("/sse"):
+        return upstream_url
+    return f"{upstream_url}/sse"
+
+
+async def _call(session: ClientSession, entry, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a METHOD_DISPATCH entry on the session and build its response data"""
+    session_method, timeout, get_args, build_result = entry
+    async with asyncio.timeout(timeout):
+        result = await getattr(session, session_method)(*get_args(params))
+    return build_result(result)
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Routes a client's requests through a shared connection pool.
+    Closing the client leaves the pool open (the base aclose is a no-op).
+    """
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+
+class _UpstreamSession:
+    """
+    An initialized MCP session to the upstream SSE server for one user.
+    
+    The SSE and ClientSession contexts are entered and exited by a dedicated
+    owner task, so their task groups and cancel scopes never cross request
+    tasks; requests from any task can use the session while it is open.
+    
+    Requests hold the session between acquire() and release(), so a retired
+    session is only closed once the calls already running on it finish.
+    """
+    
+    def __init__(self, sse_endpoint: str, access_token: str, http_client_factory):
+        self.sse_endpoint = sse_endpoint
+        self.access_token = access_token
+        self._http_client_factory = http_client_factory
+        self.session: Optional[ClientSession] = None
+        self.init_result: Optional[types.InitializeResult] = None
+        self.last_used = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._started: Optional[asyncio.Task] = None
+        self._in_use = 0
+        self._retired = False
+        self._close_task: Optional[asyncio.Task] = None
+    
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def acquire(self):
+        """Mark the session as in use by a request"""
+        self._in_use += 1
+        self.last_used = time.monotonic()
+    
+    def release(self):
+        """End a request's use of the session, closing it if it was retired meanwhile"""
+        self._in_use -= 1
+        if self._retired and self._in_use == 0 and self._close_task is None:
+            self._close_task = asyncio.create_task(self.aclose())
+    
+    def retire(self):
+        """Close the session in the background once no request is using it (right away if none is)"""
+        self._retired = True
+        if self._in_use == 0 and self._close_task is None:
+            self._close_task = asyncio.create_task(self.aclose())
+    
+    def start(self, timeout: float = 30.0):
+        """Begin connecting and initializing in the background; wait_started() reports the outcome"""
+        self._task = asyncio.create_task(self._run())
+        self._started = asyncio.create_task(self._wait_ready(timeout))
+        # Retrieve a failed start even if every request waiting on it went away
+        self._started.add_done_callback(lambda task: task.cancelled() or task.exception())
+    
+    async def wait_started(self):
+        """Wait for start() to finish, raising if the upstream session can't be established"""
+        # Shielded so one waiting request being cancelled doesn't abort the connect for the others
+        await asyncio.shield(self._started)
+    
+    async def _wait_ready(self, timeout: float):
+        ready = asyncio.create_task(self._ready.wait())
+        try:
+            await asyncio.wait({ready, self._task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready.cancel()
+        if self._ready.is_set():
+            return
+        if self._task.done():
+            # Surface the connection/initialize error from the owner task
+            if not self._task.cancelled():
+                self._task.result()
+            raise ConnectionError("Upstream SSE session closed during initialization")
+        await self.aclose()
+        raise asyncio.TimeoutError("Timeout connecting to upstream SSE server")
+    
+    async def _run(self):
+        headers = {
+            "Authorization": f"Bearer {self.access_token}"
+        }
+        async with sse_client(
+            self.sse_endpoint, headers=headers, httpx_client_factory=self._http_client_factory
+        ) as (read, write):
+            async with ClientSession(read, write) as session:
+                self.init_result = await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+    
+    async def aclose(self):
+        """Close the session and its SSE connection"""
+        self._closing.set()
+        if self._task is None:
+            return
+        if not self._ready.is_set():
+            self._task.cancel()
+        # The owner task's own errors don't matter once we're closing it
+        await asyncio.gather(self._task, return_exceptions=True)
 
 
 class MCPBridgeV2:
     """Manages MCP client connections to upstream SSE servers"""
     
     def __init__(self):
-        # We don't cache sessions - each request creates a new one
-        # This avoids the complexity of managing long-lived sessions
-        pass
+        # One initialized upstream session per user, reused across requests
+        # and replaced when it dies, goes idle, or the user's token changes
+        self._sessions: Dict[str, _UpstreamSession] = {}
+        # Replaced sessions still finishing calls, closed by their last release()
+        self._retired: set = set()
+        # In-flight COALESCED_METHODS calls by (session, method)
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        # Recent COALESCED_METHODS results by (upstream_url, token digest, method),
+        # as (expiry monotonic time, response data), oldest first. Entries share one
+        # TTL, so insertion order is also expiry order.
+        self._result_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Connection pool shared by every session's HTTP client, so new sessions
+        # to the same upstream reuse open connections instead of a new TCP+TLS
+        # handshake. Each session holds one connection for its SSE stream.
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=None)
+        )
+        self._shared_transport = _SharedTransport(self._transport)
+    
+    def _http_client_factory(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        auth: Optional[httpx.Auth] = None,
+    ) -> httpx.AsyncClient:
+        """HTTP client for sse_client, with the MCP SDK's defaults on the shared pool"""
+        return httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout or httpx.Timeout(30.0),
+            auth=auth,
+            follow_redirects=True,
+            transport=self._shared_transport,
+        )
+    
+    async def get_session(self, user_id: str, upstream_url: str, access_token: str) -> _UpstreamSession:
+        """
+        Get the user's open upstream session, connecting a new one if needed.
+        The session is returned acquired; the caller must release() it when done.
+        """
+        # Nothing here awaits, so concurrent requests for a user can't interleave
+        # between the lookup and publishing a new session
+        upstream = self._sessions.get(user_id)
+        if upstream is not None and not (upstream.alive and upstream.access_token == access_token):
+            # Swap in a new session; the old one closes once its in-flight calls finish
+            del self._sessions[user_id]
+            self._retire(upstream)
+            upstream = None
+        
+        created = upstream is None
+        if created:
+            sse_endpoint = _sse_endpoint(upstream_url)
+            logger.debug("[BridgeV2] Connecting to %s for user %s", sse_endpoint, user_id)
+            upstream = _UpstreamSession(sse_endpoint, access_token, self._http_client_factory)
+            upstream.start()
+            self._sessions[user_id] = upstream
+        upstream.acquire()
+        
+        # Requests arriving while the session connects wait for the same start
+        try:
+            await upstream.wait_started()
+        except BaseException:
+            upstream.release()
+            # Drop a session that failed to start rather than keep it until the idle sweep
+            if not upstream.alive and self._sessions.get(user_id) is upstream:
+                del self._sessions[user_id]
+                self._retire(upstream)
+            raise
+        if created:
+            logger.info("[BridgeV2] MCP session established for user %s", user_id)
+        return upstream
+    
+    def _retire(self, upstream: _UpstreamSession):
+        """Close a session that is no longer handed out, once its in-flight calls finish"""
+        self._retired.add(upstream)
+        upstream._task.add_done_callback(lambda _: self._retired.discard(upstream))
+        upstream.retire()
+    
+    async def close_session(self, user_id: str):
+        """Close a user's upstream session, if any"""
+        upstream = self._sessions.pop(user_id, None)
+        if upstream is not None:
+            await upstream.aclose()
+            logger.debug("[BridgeV2] Closed MCP session for user %s", user_id)
+    
+    async def close_idle_sessions_loop(self):
+        """Periodically close sessions nobody has used for SESSION_IDLE_TTL seconds"""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            self._close_idle_sessions()
+    
+    def _close_idle_sessions(self):
+        cutoff = time.monotonic() - SESSION_IDLE_TTL
+        for user_id, upstream in list(self._sessions.items()):
+            if upstream.last_used >= cutoff:
+                continue
+            # Remove the session first, so no caller can pick it up while it closes
+            del self._sessions[user_id]
+            self._retire(upstream)
+            logger.debug("[BridgeV2] Closing idle MCP session for user %s", user_id)
+    
+    async def _call_cached(
+        self, upstream_url: str, access_token: str, upstream: _UpstreamSession, method: str, entry
+    ) -> Dict[str, Any]:
+        """Serve a list method from the result cache, falling back to a coalesced upstream call"""
+        key = (upstream_url, hashlib.blake2b(access_token.encode(), digest_size=16).digest(), method)
+        now = time.monotonic()
+        cached = self._result_cache.get(key)
+        if cached is not None and cached[0] > now:
+            logger.debug("[BridgeV2] Serving %s from cache", method)
+            return cached[1]
+        
+        response_data = await self._call_coalesced(upstream, method, entry)
+        now = time.monotonic()
+        self._result_cache.pop(key, None)
+        self._result_cache[key] = (now + RESULT_CACHE_TTL, response_data)
+        # Drop expired entries, then the oldest live ones down to the cap
+        cache = self._result_cache
+        while cache and (len(cache) > RESULT_CACHE_MAX_ENTRIES or next(iter(cache.values()))[0] <= now):
+            cache.popitem(last=False)
+        return response_data
+    
+    async def _call_coalesced(self, upstream: _UpstreamSession, method: str, entry) -> Dict[str, Any]:
+        """Join an identical in-flight call on this session, or start one"""
+        key = (upstream, method)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(_call(upstream.session, entry, {}))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.debug("[BridgeV2] Joining in-flight %s call", method)
+        # Shielded so one caller being cancelled doesn't cancel the call for the others
+        return await asyncio.shield(task)
+    
+    async def aclose(self):
+        """Close all upstream sessions and the shared connection pool"""
+        for user_id in list(self._sessions):
+            await self.close_session(user_id)
+        for upstream in list(self._retired):
+            await upstream.aclose()
+        await self._transport.aclose()
     
     async def handle_request(
         self, 
@@ -28,105 +313,48 @@ class MCPBridgeV2:
         access_token: str,
         json_rpc_request: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Handle a JSON-RPC request by creating a temporary MCP session"""
+        """Handle a JSON-RPC request over the user's upstream MCP session"""
         method = json_rpc_request.get("method", "unknown")
         request_id = json_rpc_request.get("id")
         
         try:
-            logger.debug(f"[BridgeV2] Handling {method} for user {user_id}")
+            logger.debug("[BridgeV2] Handling %s for user %s", method, user_id)
             
-            # Construct SSE endpoint URL
-            if upstream_url.endswith("/sse"):
-                sse_endpoint = upstream_url
-            else:
-                sse_endpoint = f"{upstream_url}/sse"
+            upstream = await self.get_session(user_id, upstream_url, access_token)
+            try:
+                session = upstream.session
+                logger.debug("[BridgeV2] Calling %s", method)
+                
+                # Route to appropriate MCP method
+                params = json_rpc_request.get("params", {})
+                
+                if method == "initialize":
+                    # The session was initialized when it was opened
+                    response_data = initialize_result(upstream.init_result)
+                else:
+                    entry = METHOD_DISPATCH.get(method)
+                    if entry is None:
+                        logger.warning("[BridgeV2] Unsupported method: %s", method)
+                        return method_not_found(request_id, method)
+                    if method in COALESCED_METHODS:
+                        response_data = await self._call_cached(upstream_url, access_token, upstream, method, entry)
+                    else:
+                        response_data = await _call(session, entry, params)
+            finally:
+                upstream.release()
             
-            headers = {
-                "Authorization": f"Bearer {access_token}"
+            logger.debug("[BridgeV2] Success: %s", method)
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": response_data
             }
-            
-            logger.debug(f"[BridgeV2] Connecting to {sse_endpoint}")
-            
-            # Use proper async context managers
-            async with sse_client(sse_endpoint, headers=headers) as (read, write):
-                async with ClientSession(read, write) as session:
-                    logger.debug(f"[BridgeV2] Session established, calling {method}")
-                    
-                    # Route to appropriate MCP method
-                    params = json_rpc_request.get("params", {})
-                    
-                    if method == "initialize":
-                        result = await asyncio.wait_for(session.initialize(), timeout=30.0)
-                        response_data = {
-                            "protocolVersion": result.protocolVersion,
-                            "capabilities": result.capabilities.model_dump() if result.capabilities else {},
-                            "serverInfo": result.serverInfo.model_dump()
-                        }
-                    
-                    elif method == "tools/list":
-                        result = await asyncio.wait_for(session.list_tools(), timeout=30.0)
-                        response_data = {
-                            "tools": [tool.model_dump() for tool in result.tools]
-                        }
-                    
-                    elif method == "tools/call":
-                        tool_name = params.get("name")
-                        arguments = params.get("arguments", {})
-                        result = await asyncio.wait_for(session.call_tool(tool_name, arguments), timeout=60.0)
-                        response_data = {
-                            "content": [item.model_dump() for item in result.content],
-                            "isError": result.isError if hasattr(result, "isError") else False
-                        }
-                    
-                    elif method == "resources/list":
-                        result = await asyncio.wait_for(session.list_resources(), timeout=30.0)
-                        response_data = {
-                            "resources": [resource.model_dump() for resource in result.resources]
-                        }
-                    
-                    elif method == "resources/read":
-                        uri = params.get("uri")
-                        result = await asyncio.wait_for(session.read_resource(uri), timeout=30.0)
-                        response_data = {
-                            "contents": [content.model_dump() for content in result.contents]
-                        }
-                    
-                    elif method == "prompts/list":
-                        result = await asyncio.wait_for(session.list_prompts(), timeout=30.0)
-                        response_data = {
-                            "prompts": [prompt.model_dump() for prompt in result.prompts]
-                        }
-                    
-                    elif method == "prompts/get":
-                        prompt_name = params.get("name")
-                        arguments = params.get("arguments", {})
-                        result = await asyncio.wait_for(session.get_prompt(prompt_name, arguments), timeout=30.0)
-                        response_data = {
-                            "messages": [msg.model_dump() for msg in result.messages]
-                        }
-                    
-                    else:
-                        logger.warning(f"[BridgeV2] Unsupported method: {method}")
-                        return {
-                            "jsonrpc": "2.0",
-                            "id": request_id,
-                            "error": {
-                                "code": -32601,
-                                "message": f"Method not found: {method}"
-                            }
-                        }
-                    
-                    logger.debug(f"[BridgeV2] Success: {method}")
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": response_data
-                    }
-                    logger.debug(f"[BridgeV2] Returning response: {json.dumps(response)[:200]}")
-                    return response
-        
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[BridgeV2] Returning response: %s", orjson.dumps(response)[:200].decode(errors="replace"))
+            return response
+
         except asyncio.TimeoutError as e:
-            logger.error(f"[BridgeV2] Timeout handling {method}: {e}")
+            logger.error("[BridgeV2] Timeout handling %s: %s", method, e)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -136,7 +364,7 @@ class MCPBridgeV2:
                 }
             }
         except Exception as e:
-            logger.error(f"[BridgeV2] Error handling {method}: {e}", exc_info=True)
+            logger.error("[BridgeV2] Error handling %s: %s", method, e, exc_info=True)
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
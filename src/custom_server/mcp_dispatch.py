@@ -0,0 +1,117 @@
+"""
+JSON-RPC method dispatch shared by the MCP bridges
+Maps each supported MCP method to the ClientSession call that serves it
+"""
+from typing import Dict, Any, Callable, Tuple
+
+from mcp import types
+from pydantic import TypeAdapter
+
+
+def _list_adapter(result_model, field: str) -> TypeAdapter:
+    """Serializer for a result model's list field, built from the SDK's own annotation"""
+    return TypeAdapter(result_model.model_fields[field].annotation)
+
+
+# Each list is dumped in one serializer call instead of one model_dump() per item.
+# Results are dumped in JSON mode so values like AnyUrl come out as plain strings
+# that orjson can encode.
+_TOOLS = _list_adapter(types.ListToolsResult, "tools")
+_CONTENT = _list_adapter(types.CallToolResult, "content")
+_RESOURCES = _list_adapter(types.ListResourcesResult, "resources")
+_RESOURCE_CONTENTS = _list_adapter(types.ReadResourceResult, "contents")
+_PROMPTS = _list_adapter(types.ListPromptsResult, "prompts")
+_PROMPT_MESSAGES = _list_adapter(types.GetPromptResult, "messages")
+
+
+def _no_args(params: Dict[str, Any]) -> tuple:
+    return ()
+
+
+def _name_and_arguments(params: Dict[str, Any]) -> tuple:
+    return params.get("name"), params.get("arguments", {})
+
+
+def _uri(params: Dict[str, Any]) -> tuple:
+    return (params.get("uri"),)
+
+
+def initialize_result(result) -> Dict[str, Any]:
+    return {
+        "protocolVersion": result.protocolVersion,
+        "capabilities": result.capabilities.model_dump(mode="json") if result.capabilities else {},
+        "serverInfo": result.serverInfo.model_dump(mode="json")
+    }
+
+
+def _tools_list_result(result) -> Dict[str, Any]:
+    return {
+        "tools": _TOOLS.dump_python(result.tools, mode="json")
+    }
+
+
+def _tools_call_result(result) -> Dict[str, Any]:
+    return {
+        "content": _CONTENT.dump_python(result.content, mode="json"),
+        "isError": result.isError if hasattr(result, "isError") else False
+    }
+
+
+def _resources_list_result(result) -> Dict[str, Any]:
+    return {
+        "resources": _RESOURCES.dump_python(result.resources, mode="json")
+    }
+
+
+def _resources_read_result(result) -> Dict[str, Any]:
+    return {
+        "contents": _RESOURCE_CONTENTS.dump_python(result.contents, mode="json")
+    }
+
+
+def _prompts_list_result(result) -> Dict[str, Any]:
+    return {
+        "prompts": _PROMPTS.dump_python(result.prompts, mode="json")
+    }
+
+
+def _prompts_get_result(result) -> Dict[str, Any]:
+    return {
+        "messages": _PROMPT_MESSAGES.dump_python(result.messages, mode="json")
+    }
+
+
+# method -> (ClientSession method name, timeout in seconds, params -> call args, result -> response data)
+METHOD_DISPATCH: Dict[str, Tuple[str, float, Callable[[Dict[str, Any]], tuple], Callable[[Any], Dict[str, Any]]]] = {
+    "initialize": ("initialize", 30.0, _no_args, initialize_result),
+    "tools/list": ("list_tools", 30.0, _no_args, _tools_list_result),
+    "tools/call": ("call_tool", 60.0, _name_and_arguments, _tools_call_result),
+    "resources/list": ("list_resources", 30.0, _no_args, _resources_list_result),
+    "resources/read": ("read_resource", 30.0, _uri, _resources_read_result),
+    "prompts/list": ("list_prompts", 30.0, _no_args, _prompts_list_result),
+    "prompts/get": ("get_prompt", 30.0, _name_and_arguments, _prompts_get_result),
+}
+
+
+def method_not_found(request_id, method: str) -> Dict[str, Any]:
+    """JSON-RPC error response for an unsupported method"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": -32601,
+            "message": f"Method not found: {method}"
+        }
+    }
+
+
+def invalid_request(request_id=None) -> Dict[str, Any]:
+    """JSON-RPC error response for a message that isn't a valid request object"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {
+            "code": -32600,
+            "message": "Invalid Request"
+        }
+    }
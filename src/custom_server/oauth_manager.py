@@ -3,20 +3,56 @@ OAuth Manager for U2M authentication with MCP servers
 Handles browser-based OAuth flow with PKCE
 """
 import asyncio
+import base64
+import functools
 import hashlib
-import json
+import hmac
 import os
-import secrets
+import threading
+import time
 import webbrowser
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any
-from urllib.parse import urlencode, parse_qs, urlparse
+from typing import Optional, Dict, Any, Callable, Collection, Mapping, Tuple
+from urllib.parse import urlencode, urlparse
 import httpx
-from datetime import datetime, timedelta
+import orjson
+from datetime import datetime
 
 from .logger import logger
 
 
+# Refresh access tokens this many seconds before they expire
+REFRESH_BUFFER_SECONDS = 5 * 60
+# Tokens with less than this left are treated as expired, so they can't lapse mid-request
+EXPIRY_MARGIN_SECONDS = 30
+# After a failed refresh, ahead-of-time refreshes wait this long before trying
+# again, doubling with each further failure up to the maximum
+REFRESH_RETRY_BACKOFF_SECONDS = 60
+REFRESH_RETRY_MAX_BACKOFF_SECONDS = 60 * 60
+# How long a discovered OAuth server configuration is reused from disk
+DISCOVERY_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Authorization request parameters that are the same for every flow, encoded once
+_STATIC_AUTH_QUERY = urlencode({
+    "response_type": "code",
+    "code_challenge_method": "S256",
+    # Include offline_access to get long-lived refresh tokens
+    "scope": "openid profile email offline_access",
+})
+
+
+# server_url -> (fetched_at epoch seconds, discovered OAuth configuration)
+_discovery_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _server_hash(server_url: str) -> str:
+    """Short hash of the server URL used in state file names (one per upstream)"""
+    # Only names files, so FIPS-restricted builds may use it too
+    return hashlib.sha256(server_url.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
 class OAuthManager:
     """Manages OAuth authentication flow for MCP server"""
     
@@ -27,130 +63,307 @@ class OAuthManager:
         client_name: str = "MCP Proxy",
         config_dir: Optional[Path] = None,
         user_id: Optional[str] = None,
-        redirect_url: Optional[str] = None
+        redirect_url: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None
     ):
         self.server_url = server_url.rstrip("/")
+        # Base domain of the server URL, where OAuth discovery looks first
+        parsed = urlparse(self.server_url)
+        self._base_url = f"{parsed.scheme}://{parsed.netloc}"
         self.callback_port = callback_port
         self.client_name = client_name
         self.user_id = user_id or "default"
         self._redirect_url = redirect_url  # Custom redirect URL (for deployed environments)
+        self._set_redirect_uri()
+        # HTTP client for discovery, registration and token requests; when none is
+        # passed in, one is created on first use and owned by this manager
+        self._client = http_client
+        self._owns_client = http_client is None
         
         # Create config directory for storing tokens (per-user)
         if config_dir is None:
             config_dir = Path.home() / ".mcp" / "auth" / self.user_id
         self.config_dir = config_dir
-        self.config_dir.mkdir(parents=True, exist_ok=True)
+        # Created on first save, so managers that only read never touch the filesystem here
+        self._config_dir_ready = False
         
         # Hash server URL for file naming
-        self.server_hash = hashlib.sha256(server_url.encode()).hexdigest()[:16]
-        
-        # OAuth state and PKCE - load from disk if available, otherwise generate new
-        auth_state = self.load_auth_state()
-        if auth_state:
-            self.state = auth_state["state"]
-            self.code_verifier = auth_state["code_verifier"]
-            logger.debug(f"Loaded existing auth state for user {self.user_id}")
-        else:
-            # Generate new state (include user_id for callback routing)
-            base_state = secrets.token_urlsafe(32)
-            self.state = f"{base_state}|{self.user_id}"
-            self.code_verifier = secrets.token_urlsafe(64)
-            logger.debug(f"Generated new auth state for user {self.user_id}")
+        self.server_hash = _server_hash(server_url)
+        # config_dir and server_hash are fixed, so build the state file paths once
+        self._file_paths: Dict[str, Path] = {
+            filename: self.config_dir / f"{self.server_hash}_{filename}"
+            for filename in ("tokens.json", "client_info.json", "auth_state.json", "oauth_config.json")
+        }
         
-        self.code_challenge = self._generate_code_challenge(self.code_verifier)
+        # OAuth state and PKCE, set up by _ensure_pkce() when an auth flow needs them;
+        # most managers only ever serve cached tokens
+        self.state: Optional[str] = None
+        self.code_verifier: Optional[str] = None
+        self.code_challenge: Optional[str] = None
+        # (inputs, URL) of the last authorization URL built by start_auth_flow
+        self._auth_url: Optional[Tuple[tuple, str]] = None
         
         # Client info
         self.client_info: Optional[Dict[str, Any]] = None
         self.tokens: Optional[Dict[str, Any]] = None
+        # Expiry of the in-memory access token as epoch seconds (inf if it doesn't expire)
+        self._token_expires_at: float = 0.0
         
         # Auth code received from callback
         self.auth_code: Optional[str] = None
-        self.auth_code_event = asyncio.Event()
+        # Resolved with the code (or the callback's error) for wait_for_auth_code
+        self._auth_code_future: Optional[asyncio.Future] = None
+        
+        # Serializes token refreshes so concurrent requests share a single refresh
+        self._refresh_lock = asyncio.Lock()
+        # Refresh started off the request path for a token that is close to expiry
+        self._background_refresh: Optional[asyncio.Task] = None
+        # Consecutive failed refreshes, and the monotonic time before which
+        # refresh_if_expiring won't try again
+        self._refresh_failures = 0
+        self._refresh_retry_at = 0.0
+        # Background write of the latest tokens to disk
+        self._pending_save: Optional[asyncio.Task] = None
+        # Serializes token file writes and clears, so a logout can't be overwritten
+        # by a save that was still in flight
+        self._tokens_lock = asyncio.Lock()
+    
+    def _ensure_pkce(self) -> None:
+        """Load OAuth state and PKCE verifier from disk if available, otherwise generate new"""
+        if self.state is not None:
+            return
+        auth_state = self.load_auth_state()
+        if auth_state:
+            self.state = auth_state["state"]
+            self.code_verifier = auth_state["code_verifier"]
+            # Saved alongside the verifier since the challenge is derived from it
+            self.code_challenge = auth_state.get("code_challenge")
+            logger.debug("Loaded existing auth state for user %s", self.user_id)
+        else:
+            # Generate new state (include user_id for callback routing); one urandom
+            # call supplies both, with the same 32/64 bytes of entropy as token_urlsafe
+            raw = os.urandom(96)
+            base_state = base64.urlsafe_b64encode(raw[:32]).rstrip(b"=").decode()
+            self.state = f"{base_state}|{self.user_id}"
+            self.code_verifier = base64.urlsafe_b64encode(raw[32:]).rstrip(b"=").decode()
+            logger.debug("Generated new auth state for user %s", self.user_id)
+        
+        if not self.code_challenge:
+            self.code_challenge = self._generate_code_challenge(self.code_verifier)
+    
+    async def prepare_auth_state(self) -> None:
+        """_ensure_pkce() for async callers, with any saved auth state read in a worker thread"""
+        if self.state is None:
+            await asyncio.to_thread(self._ensure_pkce)
     
     def _generate_code_challenge(self, verifier: str) -> str:
         """Generate PKCE code challenge from verifier"""
-        import base64
-        digest = hashlib.sha256(verifier.encode()).digest()
+        digest = hashlib.sha256(verifier.encode("ascii")).digest()
         # Base64 URL-safe encoding, remove padding
-        return base64.urlsafe_b64encode(digest).decode('utf-8').rstrip('=')
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """HTTP client for OAuth requests, reused so its connections stay open between calls"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            )
+        return self._client
+    
+    async def close(self) -> None:
+        """Finish writing tokens to disk and close the HTTP client if this manager created it"""
+        # Saves take the lock in the order they were queued, so the latest finishes last
+        if self._pending_save is not None:
+            await self._pending_save
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     @property
     def redirect_uri(self) -> str:
         """OAuth redirect URI"""
+        return self._redirect_uri
+    
+    def _set_redirect_uri(self) -> None:
         if self._redirect_url:
             # Use custom redirect URL (for deployed environments)
-            return self._redirect_url
-        # Default to localhost (for local development)
-        return f"http://localhost:{self.callback_port}/oauth/callback"
+            self._redirect_uri = self._redirect_url
+        else:
+            # Default to localhost (for local development)
+            self._redirect_uri = f"http://localhost:{self.callback_port}/oauth/callback"
+        # Client metadata includes the redirect URI, so rebuild it on next use
+        self._client_metadata: Optional[Dict[str, Any]] = None
+    
+    def resolve_redirect_url(self, url: str, trusted_hosts: Collection[str]) -> None:
+        """
+        Use url (derived from a request) as the redirect URL unless one was configured
+        explicitly. Its host comes from client-controlled headers and ends up in the
+        client registration, so it is only taken when the host is in trusted_hosts.
+        """
+        if self._redirect_url:
+            return
+        host = urlparse(url).hostname
+        if host not in trusted_hosts:
+            logger.warning(
+                "Not using redirect URL %s for user %s: host isn't in OAUTH_REDIRECT_HOSTS "
+                "(set OAUTH_REDIRECT_URL for deployed environments)", url, self.user_id
+            )
+            return
+        self._redirect_url = url
+        self._set_redirect_uri()
     
     @property
     def client_metadata(self) -> Dict[str, Any]:
         """OAuth client metadata"""
-        return {
-            "redirect_uris": [self.redirect_uri],
-            "token_endpoint_auth_method": "none",
-            "grant_types": ["authorization_code", "refresh_token"],
-            "response_types": ["code"],
-            "client_name": self.client_name,
-            "client_uri": "https://github.com/modelcontextprotocol",
-        }
+        if self._client_metadata is None:
+            self._client_metadata = {
+                "redirect_uris": [self.redirect_uri],
+                "token_endpoint_auth_method": "none",
+                "grant_types": ["authorization_code", "refresh_token"],
+                "response_types": ["code"],
+                "client_name": self.client_name,
+                "client_uri": "https://github.com/modelcontextprotocol",
+            }
+        return self._client_metadata
     
     # Token storage
     def _get_file_path(self, filename: str) -> Path:
         """Get path for config file"""
-        return self.config_dir / f"{self.server_hash}_{filename}"
+        path = self._file_paths.get(filename)
+        if path is None:
+            path = self.config_dir / f"{self.server_hash}_{filename}"
+        return path
     
-    def _load_json(self, filename: str) -> Optional[Dict[str, Any]]:
-        """Load JSON from file"""
-        path = self._get_file_path(filename)
-        if path.exists():
-            with open(path, "r") as f:
-                return json.load(f)
-        return None
+    def _load_json(self, filename: str, fallback: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Load JSON from file (fallback is returned if the file can't be parsed)"""
+        # Open directly rather than checking exists() first: one syscall when the file is missing
+        try:
+            return orjson.loads(self._get_file_path(filename).read_bytes())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError as e:
+            # Saves are atomic, so this is a file damaged some other way
+            logger.warning("Ignoring unreadable %s for user %s: %s", filename, self.user_id, e)
+            return fallback
     
-    def _save_json(self, filename: str, data: Dict[str, Any]) -> None:
-        """Save JSON to file"""
+    def _save_json(self, filename: str, data: Dict[str, Any], still_current: Optional[Callable[[], bool]] = None) -> None:
+        """Save JSON to file (skipped if still_current returns False once the data is written out)"""
+        if not self._config_dir_ready:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            self._config_dir_ready = True
         path = self._get_file_path(filename)
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+        # Write a temp file and rename it over the target, so other workers (and a
+        # restart after a crash) never read a half-written file. The temp name is
+        # per process and thread, so concurrent writers never share one.
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            # orjson encodes straight to bytes; OPT_INDENT_2 keeps the on-disk format readable
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        # Checked as late as possible, so data superseded mid-write never lands
+        if still_current is not None and not still_current():
+            tmp_path.unlink()
+            return
+        os.replace(tmp_path, path)
+    
+    async def _save_json_async(self, filename: str, data: Dict[str, Any]) -> None:
+        """_save_json() in a worker thread, so the fsync doesn't stall the event loop"""
+        await asyncio.to_thread(self._save_json, filename, data)
     
     def load_tokens(self) -> Optional[Dict[str, Any]]:
         """Load saved OAuth tokens (including expired ones that can be refreshed)"""
-        tokens = self._load_json("tokens.json")
+        tokens = self._load_json("tokens.json", fallback=self.tokens)
         # Return tokens even if access token is expired - we can refresh them
         # Only return None if there are no tokens at all
-        self.tokens = tokens
+        self._set_tokens(tokens)
         return tokens
     
+    async def load_tokens_async(self) -> Optional[Dict[str, Any]]:
+        """load_tokens() with the file read done in a worker thread, off the event loop"""
+        # Memory is ahead of disk while a save (or a logout) is still being written
+        if self._tokens_lock.locked() or (self._pending_save is not None and not self._pending_save.done()):
+            return self.tokens
+        tokens = await asyncio.to_thread(self._load_json, "tokens.json", self.tokens)
+        self._set_tokens(tokens)
+        return tokens
+    
+    async def preload(self) -> None:
+        """Read saved tokens and client info ahead of the user's first request"""
+        await self.load_tokens_async()
+        if self.client_info is None:
+            await asyncio.to_thread(self.load_client_info)
+    
+    def _set_tokens(self, tokens: Optional[Dict[str, Any]]) -> None:
+        """Cache tokens in memory along with their expiry time"""
+        self.tokens = tokens
+        if not tokens:
+            self._token_expires_at = 0.0
+        elif "expires_at_epoch" in tokens:
+            self._token_expires_at = tokens["expires_at_epoch"]
+        elif tokens.get("expires_at"):
+            # Token files saved before expires_at_epoch was recorded
+            self._token_expires_at = datetime.fromisoformat(tokens["expires_at"]).timestamp()
+        else:
+            self._token_expires_at = float("inf")
+    
+    def _stamp_expiry(self, tokens: Dict[str, Any]) -> None:
+        """Calculate expiration time"""
+        if "expires_in" in tokens:
+            # Epoch seconds for expiry checks; the ISO string is kept for display
+            expires_at_epoch = time.time() + tokens["expires_in"]
+            tokens["expires_at_epoch"] = expires_at_epoch
+            tokens["expires_at"] = datetime.fromtimestamp(expires_at_epoch).isoformat()
+    
     def save_tokens(self, tokens: Dict[str, Any]) -> None:
         """Save OAuth tokens"""
-        # Calculate expiration time
-        if "expires_in" in tokens:
-            expires_at = datetime.now() + timedelta(seconds=tokens["expires_in"])
-            tokens["expires_at"] = expires_at.isoformat()
-        
-        self.tokens = tokens
+        self._stamp_expiry(tokens)
+        self._set_tokens(tokens)
         self._save_json("tokens.json", tokens)
     
+    async def _save_tokens_async(self, tokens: Dict[str, Any]) -> None:
+        """save_tokens() for async callers: memory is updated at once, the file in the background"""
+        self._stamp_expiry(tokens)
+        self._set_tokens(tokens)
+        self._pending_save = asyncio.create_task(self._write_tokens(tokens))
+    
+    async def _write_tokens(self, tokens: Dict[str, Any]) -> None:
+        # Saves are written one at a time, in order
+        async with self._tokens_lock:
+            # Newer tokens (or a logout) replaced these while waiting
+            if self.tokens is not tokens:
+                return
+            try:
+                await asyncio.to_thread(self._save_json, "tokens.json", tokens, lambda: self.tokens is tokens)
+            except Exception as e:
+                logger.error("Failed to save tokens for user %s: %s", self.user_id, e)
+    
     def load_auth_state(self) -> Optional[Dict[str, Any]]:
         """Load saved auth state (state and code_verifier for PKCE)"""
         return self._load_json("auth_state.json")
     
-    def save_auth_state(self) -> None:
-        """Save auth state for OAuth flow"""
-        auth_state = {
+    def _auth_state(self) -> Dict[str, Any]:
+        """Auth state (state and code_verifier for PKCE) as saved to disk"""
+        self._ensure_pkce()
+        return {
             "state": self.state,
             "code_verifier": self.code_verifier,
+            "code_challenge": self.code_challenge,
             "created_at": datetime.now().isoformat()
         }
-        self._save_json("auth_state.json", auth_state)
+    
+    def save_auth_state(self) -> None:
+        """Save auth state for OAuth flow"""
+        self._save_json("auth_state.json", self._auth_state())
     
     def clear_auth_state(self) -> None:
         """Clear saved auth state after successful authentication"""
-        path = self._get_file_path("auth_state.json")
-        if path.exists():
-            path.unlink()
-            logger.debug(f"Cleared auth state for user {self.user_id}")
+        try:
+            self._get_file_path("auth_state.json").unlink()
+            logger.debug("Cleared auth state for user %s", self.user_id)
+        except FileNotFoundError:
+            pass
     
     def load_client_info(self) -> Optional[Dict[str, Any]]:
         """Load saved client information"""
@@ -162,56 +375,92 @@ class OAuthManager:
         self.client_info = client_info
         self._save_json("client_info.json", client_info)
     
-    def clear_credentials(self) -> None:
+    def _remove_credential_files(self) -> None:
+        for filename in ("tokens.json", "client_info.json", "auth_state.json"):
+            self._get_file_path(filename).unlink(missing_ok=True)
+    
+    async def clear_credentials(self) -> None:
         """Clear all saved credentials"""
-        for filename in ["tokens.json", "client_info.json", "auth_state.json"]:
-            path = self._get_file_path(filename)
-            if path.exists():
-                path.unlink()
-        self.tokens = None
+        # Cleared in memory first, so a token save that is waiting or mid-write drops its data
+        self._set_tokens(None)
         self.client_info = None
+        # Waits out any save in progress, so it can't put tokens.json back after the unlink
+        async with self._tokens_lock:
+            await asyncio.to_thread(self._remove_credential_files)
     
     async def _discover_oauth_endpoints(self) -> Dict[str, Any]:
         """Discover OAuth endpoints from server"""
-        # Parse the server URL to get the base domain
-        from urllib.parse import urlparse
-        parsed = urlparse(self.server_url)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
-        
-        async with httpx.AsyncClient() as client:
-            # Try well-known endpoint at the root domain first
-            well_known_urls = [
-                f"{base_url}/.well-known/oauth-authorization-server",
-                f"{self.server_url}/.well-known/oauth-authorization-server",
-            ]
-            
-            for well_known_url in well_known_urls:
+        # The discovery document rarely changes; share it between users in this process
+        # and reuse it from disk across credential clears and restarts
+        entry = _discovery_cache.get(self.server_url)
+        if entry is None:
+            cached = await asyncio.to_thread(self._load_json, "oauth_config.json")
+            if cached:
+                entry = (cached.pop("fetched_at", 0), cached)
+        if entry is not None and time.time() - entry[0] < DISCOVERY_CACHE_TTL_SECONDS:
+            _discovery_cache[self.server_url] = entry
+            logger.debug("Using cached OAuth endpoint discovery")
+            return dict(entry[1])
+        
+        base_url = self._base_url
+        client = self._get_client()
+        # Try well-known endpoint at the root domain first
+        well_known_urls = list(dict.fromkeys([
+            f"{base_url}/.well-known/oauth-authorization-server",
+            f"{self.server_url}/.well-known/oauth-authorization-server",
+        ]))
+        
+        # Probe all URLs at once so a failing root probe doesn't delay the next one;
+        # results are still taken in order of preference
+        probes = [asyncio.create_task(client.get(url, timeout=5.0)) for url in well_known_urls]
+        oauth_config = None
+        try:
+            for well_known_url, probe in zip(well_known_urls, probes):
                 try:
-                    logger.debug(f"Trying OAuth discovery at: {well_known_url}")
-                    response = await client.get(well_known_url)
+                    logger.debug("Trying OAuth discovery at: %s", well_known_url)
+                    response = await probe
                     response.raise_for_status()
-                    oauth_config = response.json()
-                    logger.info(f"Discovered OAuth endpoints from {well_known_url}")
-                    return oauth_config
+                    oauth_config = orjson.loads(response.content)
+                    logger.info("Discovered OAuth endpoints from %s", well_known_url)
+                    break
                 except Exception as e:
-                    logger.debug(f"Could not discover at {well_known_url}: {e}")
+                    logger.debug("Could not discover at %s: %s", well_known_url, e)
                     continue
-            
-            # Fallback: try standard endpoints at base domain and server URL
-            logger.info("Using fallback OAuth endpoint discovery")
-            return {
-                "registration_endpoint": f"{base_url}/oauth/register",
-                "authorization_endpoint": f"{base_url}/oauth/authorize",
-                "token_endpoint": f"{base_url}/oauth/token",
-            }
+        finally:
+            for probe in probes:
+                if not probe.done():
+                    probe.cancel()
+                elif not probe.cancelled():
+                    # Retrieve the result so an unused failed probe isn't logged as unhandled
+                    probe.exception()
+        
+        if oauth_config is not None:
+            fetched_at = time.time()
+            _discovery_cache[self.server_url] = (fetched_at, oauth_config)
+            await self._save_json_async("oauth_config.json", {**oauth_config, "fetched_at": fetched_at})
+            return dict(oauth_config)
+        
+        # Fallback: try standard endpoints at base domain and server URL
+        logger.info("Using fallback OAuth endpoint discovery")
+        return {
+            "registration_endpoint": f"{base_url}/oauth/register",
+            "authorization_endpoint": f"{base_url}/oauth/authorize",
+            "token_endpoint": f"{base_url}/oauth/token",
+        }
     
     # OAuth flow
     async def register_client(self) -> Dict[str, Any]:
         """Register OAuth client with server"""
         # Check if client already registered
-        client_info = self.load_client_info()
+        client_info = await asyncio.to_thread(self.load_client_info)
         if client_info:
-            logger.info(f"Using existing client registration: {client_info.get('client_id')}")
+            logger.info("Using existing client registration: %s", client_info.get('client_id'))
+            # Registrations saved without their endpoints only need discovery
+            # (usually served from the discovery cache), not a new registration
+            if "oauth_config" not in client_info:
+                client_info["oauth_config"] = await self._discover_oauth_endpoints()
+                self.client_info = client_info
+                await self._save_json_async("client_info.json", client_info)
             return client_info
         
         # Discover OAuth endpoints
@@ -222,25 +471,30 @@ class OAuthManager:
         if not registration_endpoint:
             raise Exception("No registration endpoint found in OAuth configuration")
         
-        async with httpx.AsyncClient() as client:
-            logger.debug(f"Registering OAuth client at: {registration_endpoint}")
-            try:
-                response = await client.post(registration_endpoint, json=self.client_metadata)
-                response.raise_for_status()
-                
-                client_info = response.json()
-                client_info["oauth_config"] = oauth_config
-                
-                self.save_client_info(client_info)
-                logger.info(f"Registered new OAuth client: {client_info.get('client_id')}")
-                
-                return client_info
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Registration failed: {e.response.status_code} {e.response.text}")
-                raise Exception(
-                    f"OAuth client registration failed at {registration_endpoint}: "
-                    f"{e.response.status_code} - {e.response.text}"
-                )
+        client = self._get_client()
+        logger.debug("Registering OAuth client at: %s", registration_endpoint)
+        try:
+            response = await client.post(
+                registration_endpoint,
+                content=orjson.dumps(self.client_metadata),
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+            
+            client_info = orjson.loads(response.content)
+            client_info["oauth_config"] = oauth_config
+            
+            self.client_info = client_info
+            await self._save_json_async("client_info.json", client_info)
+            logger.info("Registered new OAuth client: %s", client_info.get('client_id'))
+            
+            return client_info
+        except httpx.HTTPStatusError as e:
+            logger.error("Registration failed: %s %s", e.response.status_code, e.response.text)
+            raise Exception(
+                f"OAuth client registration failed at {registration_endpoint}: "
+                f"{e.response.status_code} - {e.response.text}"
+            )
     
     async def start_auth_flow(self) -> str:
         """Start OAuth authorization flow and return auth URL"""
@@ -249,44 +503,46 @@ class OAuthManager:
         oauth_config = client_info.get("oauth_config", {})
         
         # Save auth state to disk so it persists across app restarts/reloads
-        self.save_auth_state()
-        logger.debug(f"Saved auth state for user {self.user_id} (state: {self.state[:20]}...)")
+        await self._save_json_async("auth_state.json", self._auth_state())
+        logger.debug("Saved auth state for user %s (state: %s...)", self.user_id, self.state[:20])
         
         # Build authorization URL
         auth_endpoint = oauth_config.get("authorization_endpoint", f"{self.server_url}/oauth/authorize")
         
-        params = {
-            "client_id": client_info["client_id"],
-            "response_type": "code",
-            "redirect_uri": self.redirect_uri,
-            "state": self.state,
-            "code_challenge": self.code_challenge,
-            "code_challenge_method": "S256",
-            # Include offline_access to get long-lived refresh tokens
-            "scope": "openid profile email offline_access",
-        }
-        
-        auth_url = f"{auth_endpoint}?{urlencode(params)}"
-        return auth_url
+        # Every value is fixed until the registration, redirect URI or PKCE state changes,
+        # so repeated auth attempts reuse the previously built URL
+        key = (auth_endpoint, client_info["client_id"], self.redirect_uri, self.state, self.code_challenge)
+        if self._auth_url is None or self._auth_url[0] != key:
+            params = {
+                "client_id": client_info["client_id"],
+                "redirect_uri": self.redirect_uri,
+                "state": self.state,
+                "code_challenge": self.code_challenge,
+            }
+            self._auth_url = (key, f"{auth_endpoint}?{urlencode(params)}&{_STATIC_AUTH_QUERY}")
+        return self._auth_url[1]
     
     def open_browser_for_auth(self, auth_url: str) -> None:
         """Open browser for user authentication"""
         logger.info("Opening browser for authentication...")
-        logger.info(f"If browser doesn't open, visit: {auth_url}")
+        logger.info("If browser doesn't open, visit: %s", auth_url)
         try:
             webbrowser.open(auth_url)
         except Exception as e:
-            logger.warning(f"Could not open browser automatically: {e}")
+            logger.warning("Could not open browser automatically: %s", e)
             logger.info("Please visit the URL above manually.")
     
     async def wait_for_auth_code(self, timeout: int = 300) -> str:
         """Wait for OAuth callback with authorization code"""
-        try:
-            await asyncio.wait_for(self.auth_code_event.wait(), timeout=timeout)
-            if not self.auth_code:
-                raise Exception("No authorization code received")
+        # The callback may already have arrived
+        if self.auth_code:
             return self.auth_code
-        except asyncio.TimeoutError:
+        if self._auth_code_future is None or self._auth_code_future.done():
+            self._auth_code_future = asyncio.get_running_loop().create_future()
+        try:
+            async with asyncio.timeout(timeout):
+                return await self._auth_code_future
+        except TimeoutError:
             raise Exception(f"Authentication timeout after {timeout} seconds")
     
     async def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
@@ -298,6 +554,7 @@ class OAuthManager:
         oauth_config = client_info.get("oauth_config", {})
         token_endpoint = oauth_config.get("token_endpoint", f"{self.server_url}/oauth/token")
         
+        self._ensure_pkce()
         data = {
             "grant_type": "authorization_code",
             "code": code,
@@ -306,25 +563,54 @@ class OAuthManager:
             "code_verifier": self.code_verifier,
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_endpoint, data=data)
-            response.raise_for_status()
-            
-            tokens = response.json()
-            self.save_tokens(tokens)
-            
-            # Clear auth state after successful token exchange
-            self.clear_auth_state()
-            
-            logger.info("Successfully obtained access tokens")
+        client = self._get_client()
+        response = await client.post(token_endpoint, data=data)
+        response.raise_for_status()
+        
+        tokens = orjson.loads(response.content)
+        await self._save_tokens_async(tokens)
+        # A fresh login brings a new refresh token, so earlier failures no longer apply
+        self._refresh_failures = 0
+        self._refresh_retry_at = 0.0
+        
+        # Clear auth state after successful token exchange
+        await asyncio.to_thread(self.clear_auth_state)
+        
+        logger.info("Successfully obtained access tokens")
+        return tokens
+    
+    async def refresh_access_token(self, stale_access_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Refresh access token using refresh token.
+        Only one refresh runs at a time; if stale_access_token is given and the tokens
+        were already refreshed while waiting, the new tokens are returned instead.
+        """
+        async with self._refresh_lock:
+            if stale_access_token and self.tokens and self.tokens.get("access_token") != stale_access_token:
+                logger.debug("Access token already refreshed by a concurrent request")
+                return self.tokens
+            try:
+                tokens = await self._refresh_access_token()
+            except Exception:
+                # Back off so a revoked refresh token isn't retried against the IdP
+                # on every background pass
+                self._refresh_failures += 1
+                backoff = min(
+                    REFRESH_RETRY_BACKOFF_SECONDS * 2 ** (self._refresh_failures - 1),
+                    REFRESH_RETRY_MAX_BACKOFF_SECONDS,
+                )
+                self._refresh_retry_at = time.monotonic() + backoff
+                raise
+            self._refresh_failures = 0
+            self._refresh_retry_at = 0.0
             return tokens
     
-    async def refresh_access_token(self) -> Dict[str, Any]:
-        """Refresh access token using refresh token"""
+    async def _refresh_access_token(self) -> Dict[str, Any]:
+        """Refresh access token using refresh token (caller holds the refresh lock)"""
         if not self.tokens or "refresh_token" not in self.tokens:
             raise Exception("No refresh token available")
         
-        client_info = self.client_info
+        client_info = self.client_info or await asyncio.to_thread(self.load_client_info)
         if not client_info:
             raise Exception("Client not registered")
         
@@ -337,27 +623,68 @@ class OAuthManager:
             "client_id": client_info["client_id"],
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_endpoint, data=data)
-            response.raise_for_status()
-            
-            new_tokens = response.json()
-            
-            # Some OAuth servers don't return a new refresh token when refreshing
-            # In that case, preserve the existing refresh token
-            if "refresh_token" not in new_tokens and "refresh_token" in self.tokens:
-                new_tokens["refresh_token"] = self.tokens["refresh_token"]
-                logger.debug("Preserved existing refresh token (server didn't return a new one)")
-            
-            self.save_tokens(new_tokens)
-            
-            logger.info("Successfully refreshed access token")
-            return new_tokens
+        client = self._get_client()
+        response = await client.post(token_endpoint, data=data)
+        response.raise_for_status()
+        
+        new_tokens = orjson.loads(response.content)
+        
+        # Some OAuth servers don't return a new refresh token when refreshing
+        # In that case, preserve the existing refresh token
+        if "refresh_token" not in new_tokens and "refresh_token" in self.tokens:
+            new_tokens["refresh_token"] = self.tokens["refresh_token"]
+            logger.debug("Preserved existing refresh token (server didn't return a new one)")
+        
+        await self._save_tokens_async(new_tokens)
+        
+        logger.info("Successfully refreshed access token")
+        return new_tokens
+    
+    async def refresh_if_expiring(self, within_seconds: float) -> bool:
+        """
+        Refresh the access token ahead of time if it expires within within_seconds.
+        Skipped while backing off after a failed refresh.
+        """
+        if not self.tokens or "refresh_token" not in self.tokens:
+            return False
+        if time.monotonic() < self._refresh_retry_at:
+            return False
+        if self._token_expires_at - time.time() > within_seconds:
+            return False
+        
+        # Another worker may already have refreshed the tokens on disk
+        if not await self.load_tokens_async() or self._token_expires_at - time.time() > within_seconds:
+            return False
+        
+        await self.refresh_access_token(stale_access_token=self.tokens["access_token"])
+        return True
+    
+    def _start_background_refresh(self) -> None:
+        """Refresh the tokens in a background task, unless one is already running"""
+        if self._background_refresh is None or self._background_refresh.done():
+            self._background_refresh = asyncio.create_task(self._refresh_in_background())
+    
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self.refresh_if_expiring(REFRESH_BUFFER_SECONDS)
+        except Exception as e:
+            logger.warning("Background token refresh failed for user %s: %s", self.user_id, e)
     
     async def get_valid_access_token(self) -> str:
         """Get a valid access token, refreshing if necessary"""
-        # Load existing tokens
-        tokens = self.load_tokens()
+        if self.tokens:
+            time_until_expiry = self._token_expires_at - time.time()
+            # Fast path: the in-memory token is not close to expiry, so skip the disk read
+            if time_until_expiry > REFRESH_BUFFER_SECONDS:
+                return self.tokens["access_token"]
+            # Close to expiry but still usable: refresh off the request path and
+            # only block callers once the token has actually expired
+            if time_until_expiry > EXPIRY_MARGIN_SECONDS and "refresh_token" in self.tokens:
+                self._start_background_refresh()
+                return self.tokens["access_token"]
+        
+        # Load existing tokens (another worker may have refreshed them)
+        tokens = await self.load_tokens_async()
         
         if not tokens:
             raise Exception("No tokens available - authentication required")
@@ -366,54 +693,65 @@ class OAuthManager:
             logger.warning("No refresh token available - user will need to re-authenticate when token expires")
         
         # Check if token is expired or will expire soon (within 5 minutes)
-        expires_at = tokens.get("expires_at")
-        refresh_buffer = timedelta(minutes=5)
+        # load_tokens() has already parsed expires_at (inf when the token doesn't expire)
+        time_until_expiry = self._token_expires_at - time.time()
         
-        if expires_at:
-            expiry_time = datetime.fromisoformat(expires_at)
-            time_until_expiry = expiry_time - datetime.now()
-            
-            if time_until_expiry < refresh_buffer:
-                # Token expired or expiring soon - refresh it
-                if "refresh_token" in tokens:
-                    try:
-                        logger.info(f"Access token expires in {time_until_expiry.total_seconds():.0f}s - refreshing now")
-                        tokens = await self.refresh_access_token()
-                    except Exception as e:
-                        logger.error(f"Failed to refresh token: {e}")
-                        # If token is already expired, require re-auth
-                        if time_until_expiry.total_seconds() < 0:
-                            raise Exception("Token expired and refresh failed - re-authentication required")
-                        # Otherwise, use the existing token (still valid for a bit)
-                        logger.warning("Refresh failed but token still valid - will retry on next request")
-                else:
-                    if time_until_expiry.total_seconds() < 0:
-                        raise Exception("Token expired and no refresh token available - re-authentication required")
+        if time_until_expiry < REFRESH_BUFFER_SECONDS:
+            # Token expired or expiring soon - refresh it
+            if "refresh_token" in tokens:
+                try:
+                    logger.info("Access token expires in %.0fs - refreshing now", time_until_expiry)
+                    tokens = await self.refresh_access_token(stale_access_token=tokens["access_token"])
+                except Exception as e:
+                    logger.error("Failed to refresh token: %s", e)
+                    # If token is already expired, require re-auth
+                    if time_until_expiry < 0:
+                        raise Exception("Token expired and refresh failed - re-authentication required")
+                    # Otherwise, use the existing token (still valid for a bit)
+                    logger.warning("Refresh failed but token still valid - will retry on next request")
+            else:
+                if time_until_expiry < 0:
+                    raise Exception("Token expired and no refresh token available - re-authentication required")
         
         return tokens["access_token"]
     
-    def handle_callback(self, query_params: Dict[str, Any]) -> Dict[str, str]:
+    def _resolve_auth_code(self, code: Optional[str] = None, exception: Optional[Exception] = None) -> None:
+        """Wake a pending wait_for_auth_code with the callback's outcome"""
+        future = self._auth_code_future
+        if future is None or future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(code)
+    
+    def handle_callback(self, query_params: Mapping[str, str]) -> Dict[str, str]:
         """Handle OAuth callback with authorization code"""
         # Verify state
-        state = query_params.get("state", [""])[0]
-        if state != self.state:
+        self._ensure_pkce()
+        state = query_params.get("state", "")
+        # Constant-time comparison; bytes, since compare_digest rejects non-ASCII str
+        if not hmac.compare_digest(state.encode(), self.state.encode()):
             return {
                 "status": "error",
                 "message": "Invalid state parameter - possible CSRF attack"
             }
         
         # Check for errors
-        error = query_params.get("error", [""])[0]
+        error = query_params.get("error", "")
         if error:
-            error_description = query_params.get("error_description", ["Unknown error"])[0]
+            error_description = query_params.get("error_description", "Unknown error")
+            message = f"OAuth error: {error} - {error_description}"
+            self._resolve_auth_code(exception=Exception(message))
             return {
                 "status": "error",
-                "message": f"OAuth error: {error} - {error_description}"
+                "message": message
             }
         
         # Get authorization code
-        code = query_params.get("code", [""])[0]
+        code = query_params.get("code", "")
         if not code:
+            self._resolve_auth_code(exception=Exception("No authorization code received"))
             return {
                 "status": "error",
                 "message": "No authorization code received"
@@ -421,10 +759,68 @@ class OAuthManager:
         
         # Store code and signal completion
         self.auth_code = code
-        self.auth_code_event.set()
+        self._resolve_auth_code(code=code)
         
         return {
             "status": "success",
             "message": "Authorization successful! You can close this window."
         }
 
+
+class OAuthManagerStore(OrderedDict):
+    """
+    Thread-safe, LRU-bounded cache of per-user OAuthManager instances.
+    
+    Managers are only an in-process view: tokens, client info and auth state
+    live on disk under ~/.mcp/auth/{user_id}/, so uvicorn workers sharing that
+    directory see each other's logins, and an evicted manager is simply
+    rebuilt from disk on the next request.
+    
+    Entries idle for longer than idle_ttl seconds are dropped lazily on the
+    next lookup.
+    """
+    
+    def __init__(self, factory: Callable[[str], OAuthManager], maxsize: int = 1024, idle_ttl: float = 3600.0):
+        super().__init__()
+        self._factory = factory
+        self._maxsize = maxsize
+        self._idle_ttl = idle_ttl
+        self._last_used: dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def get_or_create(self, user_id: str) -> OAuthManager:
+        """Return the manager for user_id, constructing it at most once"""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._last_used[user_id] = now
+            
+            manager = self.get(user_id)
+            if manager is not None:
+                self.move_to_end(user_id)
+                return manager
+            
+            manager = self._factory(user_id)
+            self[user_id] = manager
+            if len(self) > self._maxsize:
+                evicted_user_id, _ = self.popitem(last=False)
+                del self._last_used[evicted_user_id]
+                logger.debug("Evicted OAuthManager for user: %s", evicted_user_id)
+            return manager
+    
+    def _sweep(self, now: float):
+        """Drop idle entries; the dict is in LRU order so only the head is checked"""
+        cutoff = now - self._idle_ttl
+        while self:
+            user_id = next(iter(self))
+            if self._last_used[user_id] > cutoff:
+                break
+            self.popitem(last=False)
+            del self._last_used[user_id]
+            logger.debug("Expired idle OAuthManager for user: %s", user_id)
+    
+    def snapshot(self) -> list[OAuthManager]:
+        """Return the currently cached managers, after dropping idle ones"""
+        with self._lock:
+            self._sweep(time.monotonic())
+            return list(self.values())
@@ -2,34 +2,158 @@
 Proxy endpoints and handlers for forwarding requests to the upstream MCP server
 """
 import re
-import json
+import asyncio
+import logging
 from fastapi import Request, HTTPException
-from fastapi.responses import StreamingResponse, Response, JSONResponse
+from fastapi.responses import StreamingResponse, Response, ORJSONResponse
+from starlette.background import BackgroundTask
+from sse_starlette.sse import EventSourceResponse
 import httpx
+import orjson
 
-from .auth import check_auth_status
+from .auth import require_access_token
 from .logger import logger
 from .mcp_bridge_v2 import mcp_bridge_v2
+from .mcp_dispatch import invalid_request
 
 
-async def _proxy_sse_handler(request: Request, oauth_manager, upstream_url: str):
-    """Shared SSE proxy handler logic"""
-    logger.debug(f"[SSE] Incoming request: {request.method} {request.url.path}")
-    logger.debug(f"[SSE] Query params: {dict(request.query_params)}")
-    logger.debug(f"[SSE] Headers: {dict(request.headers)}")
+# Request headers not forwarded upstream (header names are already lowercase
+# in both Starlette and httpx, so no per-header .lower() is needed).
+# accept-encoding is dropped so httpx negotiates only encodings it can decode.
+# Hop-by-hop headers describe the client's connection to this proxy, not the
+# upstream one - httpx frames the forwarded body itself.
+EXCLUDED_FORWARD_HEADERS = frozenset({
+    "host", "authorization", "content-length", "accept-encoding",
+    "connection", "keep-alive", "proxy-authorization", "proxy-connection",
+    "te", "trailer", "transfer-encoding", "upgrade",
+})
+EXCLUDED_MESSAGE_HEADERS = EXCLUDED_FORWARD_HEADERS | {"content-type"}
+# Upstream response headers not copied back to the client (bodies are relayed
+# already decoded by httpx, so the upstream content-encoding no longer applies)
+EXCLUDED_RESPONSE_HEADERS = frozenset({"content-length", "transfer-encoding", "content-encoding"})
+
+# Paths with dedicated handlers that the catch-all proxy must not forward.
+# Registered routes already win for matching methods, but a method mismatch
+# (e.g. GET /message) or an unknown /api/ path still falls through to it.
+SKIP_PATH_PREFIXES = ("oauth/", "api/")
+SKIP_EXACT_PATHS = frozenset({"sse", "message", ""})
+SKIP_VERSIONED_PATH = re.compile(r"v\d+/(sse|message)")
+
+# Methods whose request body is forwarded by the catch-all proxy
+BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+
+# Catch-all bodies larger than this (or of unknown length) are streamed upstream
+# instead of read into memory first. A streamed body can't be replayed, so a 401
+# on such a request refreshes the token but is not retried.
+STREAM_BODY_THRESHOLD = 1024 * 1024
+
+# Seconds between keep-alive comments on idle SSE streams, so reverse
+# proxies that drop idle connections after 30-60s keep them open
+SSE_PING_INTERVAL = 15
+
+# Blank lines that end an SSE event, for each of the spec's line endings
+SSE_EVENT_SEPARATORS = (b"\n\n", b"\r\r", b"\r\n\r\n")
+# Bytes of an earlier read a separator can still start in (longest separator - 1)
+SSE_SEPARATOR_OVERLAP = max(map(len, SSE_EVENT_SEPARATORS)) - 1
+
+
+def _forward_headers(request: Request, access_token: str, excluded: frozenset = EXCLUDED_FORWARD_HEADERS) -> dict:
+    """Copy the client's request headers for upstream, minus excluded ones, with the user's token"""
+    headers = {k: v for k, v in request.headers.items() if k not in excluded}
+    headers["Authorization"] = f"Bearer {access_token}"
+    return headers
+
+
+def _last_event_end(buffer: bytearray, start: int) -> int:
+    """Offset just past the last complete SSE event in buffer, searching from start (0 if there is none)"""
+    end = 0
+    for separator in SSE_EVENT_SEPARATORS:
+        found = buffer.rfind(separator, start)
+        if found >= 0:
+            end = max(end, found + len(separator))
+    return end
+
+
+def _has_body(request: Request) -> bool:
+    """Whether the request carries a body, judged from its headers without reading it"""
+    headers = request.headers
+    if "transfer-encoding" in headers:
+        return True
+    return headers.get("content-length", "0") not in ("", "0")
+
+
+def _streams_body(request: Request) -> bool:
+    """Whether the body is chunked or larger than STREAM_BODY_THRESHOLD, so it should be streamed"""
+    length = request.headers.get("content-length")
+    if length is None:
+        return "transfer-encoding" in request.headers
+    return length.isdigit() and int(length) > STREAM_BODY_THRESHOLD
+
+
+async def _send_upstream(
+    http_client: httpx.AsyncClient,
+    oauth_manager,
+    access_token: str,
+    headers: dict,
+    method: str,
+    url,
+    **kwargs
+) -> httpx.Response:
+    """
+    Send a request upstream without buffering the response body.
+    Retries once with a refreshed token if upstream returns 401 (unless the
+    request body was streamed and can't be sent again). The returned
+    response is still open - the caller streams it and must close it.
+    """
+    response = await http_client.send(
+        http_client.build_request(method, url, headers=headers, **kwargs), stream=True
+    )
     
-    # Check authentication
-    if not await check_auth_status(oauth_manager):
-        raise HTTPException(
-            status_code=401, 
-            detail="Authentication required. Please visit http://localhost:8000/ to authenticate."
-        )
+    if response.status_code == 401:
+        await response.aclose()
+        # Try refreshing token
+        try:
+            new_token = await oauth_manager.refresh_access_token(stale_access_token=access_token)
+            content = kwargs.get("content")
+            if content is not None and not isinstance(content, bytes):
+                raise HTTPException(status_code=401, detail="Access token was refreshed - please retry the request")
+            headers["Authorization"] = f"Bearer {new_token['access_token']}"
+            response = await http_client.send(
+                http_client.build_request(method, url, headers=headers, **kwargs), stream=True
+            )
+        except HTTPException:
+            raise
+        except Exception:
+            raise HTTPException(status_code=401, detail="Authentication failed - please restart server")
+        if response.is_error:
+            await response.aclose()
+            raise HTTPException(status_code=401, detail="Authentication failed - please restart server")
     
-    # Get access token
-    try:
-        access_token = await oauth_manager.get_valid_access_token()
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication required: {e}")
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        response.raise_for_status()
+    
+    return response
+
+
+async def _proxy_sse_handler(
+    request: Request,
+    oauth_manager,
+    sse_url: httpx.URL,
+    http_client: httpx.AsyncClient,
+    stream_client: httpx.AsyncClient,
+    sse_slots: asyncio.Semaphore,
+):
+    """Shared SSE proxy handler logic"""
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("[SSE] Incoming request: %s %s", request.method, request.url.path)
+        logger.debug("[SSE] Query params: %s", dict(request.query_params))
+        logger.debug("[SSE] Headers: %s", dict(request.headers))
+    
+    # Check authentication and get access token
+    access_token = await require_access_token(oauth_manager)
     
     # Use query params as-is (don't generate sessionId)
     # If upstream requires sessionId and client doesn't provide it, the 404 error
@@ -38,92 +162,108 @@ async def _proxy_sse_handler(request: Request, oauth_manager, upstream_url: str)
     
     # Read request body if present (for POST requests)
     body = None
-    if request.method == "POST":
+    if request.method == "POST" and _has_body(request):
         body = await request.body()
-        logger.debug(f"[SSE] Request body: {body[:200] if body else None}")
+        if debug:
+            logger.debug("[SSE] Request body: %s", body[:200] if body else None)
     
-    # Construct upstream URL
-    sse_url = f"{upstream_url}/sse"
-    logger.debug(f"[SSE] Proxying to: {sse_url} (method: {request.method}, has_body: {body is not None})")
+    logger.debug("[SSE] Proxying to: %s (method: %s, has_body: %s)", sse_url, request.method, body is not None)
     
-    # Prepare headers
-    headers = {
-        k: v for k, v in request.headers.items() 
-        if k.lower() not in ["host", "authorization", "content-length"]
-    }
-    headers["Authorization"] = f"Bearer {access_token}"
+    headers = _forward_headers(request, access_token)
     
     # For POST requests, check status first (they return complete responses)
     # For GET requests (SSE), stream directly (they're long-lived connections)
     if request.method == "POST":
         # POST requests return complete responses, so we can check status first
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.request(
+        response = await http_client.request(
+            request.method,
+            sse_url,
+            headers=headers,
+            params=query_params,
+            content=body,
+            timeout=30.0,
+        )
+        
+        if debug:
+            logger.debug("[SSE] Upstream response status: %s", response.status_code)
+            logger.debug("[SSE] Upstream response headers: %s", dict(response.headers))
+        
+        # Errors are logged so the client can fall back; either way the response is
+        # returned exactly as received from upstream, with its headers filtered once
+        if response.status_code >= 400:
+            logger.info("[SSE] Upstream error (%s): %s", response.status_code, response.text)
+            logger.debug("[SSE] Returning error to client for fallback")
+        else:
+            logger.debug("[SSE] POST successful, returning response")
+        
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k not in EXCLUDED_RESPONSE_HEADERS},
+        )
+    else:
+        # GET requests are SSE connections - stream directly without checking first
+        logger.debug("[SSE] GET request - setting up SSE streaming...")
+        
+        # Ask upstream for an uncompressed stream so raw bytes can be relayed as-is
+        # (compression would also hold back events until a block fills)
+        headers["Accept-Encoding"] = "identity"
+        
+        async def stream_from_upstream():
+            # SSE connections are long-lived, so they use the dedicated stream pool
+            # with no read timeout. sse_slots caps how many are open upstream at
+            # once; further clients wait here for a slot.
+            async with sse_slots, stream_client.stream(
                 request.method,
                 sse_url,
                 headers=headers,
                 params=query_params,
                 content=body,
-            )
-            
-            logger.debug(f"[SSE] Upstream response status: {response.status_code}")
-            logger.debug(f"[SSE] Upstream response headers: {dict(response.headers)}")
-            
-            # If error, return it immediately with proper headers
-            if response.status_code >= 400:
-                error_text = response.text
-                logger.info(f"[SSE] Upstream error ({response.status_code}): {error_text}")
-                logger.debug(f"[SSE] Returning error to client for fallback")
+            ) as stream_response:
+                logger.debug("[SSE] Upstream response status: %s", stream_response.status_code)
                 
-                # Return the error response exactly as received from upstream
-                return Response(
-                    content=error_text,
-                    status_code=response.status_code,
-                    headers={k: v for k, v in response.headers.items() if k.lower() not in ["content-length", "transfer-encoding"]},
-                )
-            
-            # If success, return the response
-            logger.debug(f"[SSE] POST successful, returning response")
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers={k: v for k, v in response.headers.items() if k.lower() not in ["content-length", "transfer-encoding"]},
-            )
-    else:
-        # GET requests are SSE connections - stream directly without checking first
-        logger.debug(f"[SSE] GET request - setting up SSE streaming...")
+                # If error, we can't really handle it here after headers are sent
+                # But at least log it
+                if stream_response.status_code >= 400:
+                    error_body = await stream_response.aread()
+                    error_text = error_body.decode('utf-8', errors='ignore')
+                    logger.error("[SSE] Upstream error (%s): %s", stream_response.status_code, error_text)
+                    return
+                
+                # Relay raw bytes untouched - no decoding or re-encoding per event.
+                # Chunks are cut at event boundaries so a keep-alive ping can never
+                # land in the middle of an event.
+                # Only the newly read bytes (plus the tail a separator could start
+                # in) are searched, since pending never holds a whole separator.
+                pending = bytearray()
+                async for chunk in stream_response.aiter_raw():
+                    start = max(len(pending) - SSE_SEPARATOR_OVERLAP, 0)
+                    pending += chunk
+                    end = _last_event_end(pending, start)
+                    if end:
+                        yield bytes(pending[:end])
+                        del pending[:end]
+                
+                if pending:
+                    yield bytes(pending)
+                logger.debug("[SSE] Finished streaming")
         
-        async def stream_from_upstream():
-            async with httpx.AsyncClient(timeout=None) as stream_client:
-                async with stream_client.stream(
-                    request.method,
-                    sse_url,
-                    headers=headers,
-                    params=query_params,
-                    content=body,
-                ) as stream_response:
-                    logger.debug(f"[SSE] Upstream response status: {stream_response.status_code}")
-                    
-                    # If error, we can't really handle it here after headers are sent
-                    # But at least log it
-                    if stream_response.status_code >= 400:
-                        error_body = await stream_response.aread()
-                        error_text = error_body.decode('utf-8', errors='ignore')
-                        logger.error(f"[SSE] Upstream error ({stream_response.status_code}): {error_text}")
-                        return
-                    
-                    chunk_count = 0
-                    async for chunk in stream_response.aiter_bytes():
-                        chunk_count += 1
-                        if chunk_count <= 3:
-                            logger.debug(f"[SSE] Streaming chunk {chunk_count}: {len(chunk)} bytes")
-                        yield chunk
-                    
-                    logger.debug(f"[SSE] Finished streaming {chunk_count} chunks")
+        # A client disconnect can stop the response while the generator is parked
+        # at a yield, which would leave the upstream stream and its slot open until
+        # the generator is garbage collected - close it explicitly once the
+        # response finishes (a no-op if it already ran to completion)
+        events = stream_from_upstream()
         
-        return StreamingResponse(
-            stream_from_upstream(),
-            media_type="text/event-stream",
+        async def close_events():
+            # Wrapped because BackgroundTask would treat the builtin aclose as
+            # sync and call it in a thread without awaiting it
+            await events.aclose()
+        
+        # EventSourceResponse passes bytes through as-is and adds keep-alive pings
+        return EventSourceResponse(
+            events,
+            ping=SSE_PING_INTERVAL,
+            background=BackgroundTask(close_events),
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
@@ -132,67 +272,57 @@ async def _proxy_sse_handler(request: Request, oauth_manager, upstream_url: str)
         )
 
 
-async def _proxy_message_handler(request: Request, oauth_manager, upstream_url: str):
+async def _proxy_message_handler(request: Request, oauth_manager, message_url: httpx.URL, http_client: httpx.AsyncClient):
     """Shared message proxy handler logic"""
-    logger.debug(f"[MESSAGE] Incoming request: {request.method} {request.url.path}")
+    logger.debug("[MESSAGE] Incoming request: %s %s", request.method, request.url.path)
     
-    # Check authentication
-    if not await check_auth_status(oauth_manager):
-        raise HTTPException(
-            status_code=401,
-            detail="Authentication required. Please visit http://localhost:8000/ to authenticate."
-        )
+    # Check authentication and get access token
+    access_token = await require_access_token(oauth_manager)
     
-    # Get access token
-    try:
-        access_token = await oauth_manager.get_valid_access_token()
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication required: {e}")
+    body = await request.body() if _has_body(request) else None
     
-    body = await request.body()
+    logger.debug("[MESSAGE] Proxying to: %s", message_url)
     
-    # Construct upstream URL
-    message_url = f"{upstream_url}/message"
-    logger.debug(f"[MESSAGE] Proxying to: {message_url}")
+    headers = _forward_headers(request, access_token, EXCLUDED_MESSAGE_HEADERS)
+    headers["Content-Type"] = request.headers.get("content-type", "application/json")
     
-    # Prepare headers with OAuth token
-    headers = {
-        "Content-Type": request.headers.get("content-type", "application/json"),
-        "Authorization": f"Bearer {access_token}",
-        **{k: v for k, v in request.headers.items() 
-           if k.lower() not in ["host", "content-length", "content-type", "authorization"]}
-    }
+    response = await _send_upstream(
+        http_client, oauth_manager, access_token, headers,
+        "POST", message_url, content=body,
+    )
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.post(
-                message_url,
-                content=body,
-                headers=headers,
-            )
-            response.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 401:
-                # Try refreshing token
-                try:
-                    new_token = await oauth_manager.refresh_access_token()
-                    headers["Authorization"] = f"Bearer {new_token['access_token']}"
-                    response = await client.post(
-                        message_url,
-                        content=body,
-                        headers=headers,
-                    )
-                    response.raise_for_status()
-                except Exception:
-                    raise HTTPException(status_code=401, detail="Authentication failed - please restart server")
-            else:
-                raise
-        
-        return StreamingResponse(
-            iter([response.content]),
-            status_code=response.status_code,
-            media_type=response.headers.get("content-type", "application/json"),
-        )
+    return StreamingResponse(
+        response.aiter_bytes(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/json"),
+        background=BackgroundTask(response.aclose),
+    )
+
+
+def _request_error(message):
+    """Invalid Request error for a JSON-RPC message that isn't a request or notification object, else None"""
+    if isinstance(message, dict):
+        if isinstance(message.get("method"), str):
+            return None
+        return invalid_request(message.get("id"))
+    return invalid_request()
+
+
+async def _bridge_message(message, user_id: str, upstream_url: str, access_token: str):
+    """Bridge one JSON-RPC message; returns None for notifications, which get no response"""
+    error = _request_error(message)
+    if error is not None:
+        return error
+    if "id" not in message:
+        # None of the bridged methods are notifications, so there is nothing to forward
+        logger.debug("[Bridge] Ignoring notification: %s", message["method"])
+        return None
+    return await mcp_bridge_v2.handle_request(
+        user_id=user_id,
+        upstream_url=upstream_url,
+        access_token=access_token,
+        json_rpc_request=message
+    )
 
 
 async def _streamable_http_bridge_handler(request: Request, oauth_manager, upstream_url: str, user_id: str):
@@ -200,28 +330,22 @@ async def _streamable_http_bridge_handler(request: Request, oauth_manager, upstr
     Bridge handler for Streamable HTTP clients connecting to SSE upstream.
     Uses MCP Python SDK to translate between protocols.
     """
-    logger.debug(f"[Bridge] Incoming Streamable HTTP request from user {user_id}")
+    logger.debug("[Bridge] Incoming Streamable HTTP request from user %s", user_id)
     
-    # Check authentication
-    if not await check_auth_status(oauth_manager):
-        raise HTTPException(
-            status_code=401,
-            detail="Authentication required. Please visit http://localhost:8000/ to authenticate."
-        )
-    
-    # Get access token
-    try:
-        access_token = await oauth_manager.get_valid_access_token()
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication required: {e}")
+    # Check authentication and get access token
+    access_token = await require_access_token(oauth_manager)
     
     # Read JSON-RPC request
     try:
         body = await request.body()
-        json_rpc_request = json.loads(body)
-        logger.debug(f"[Bridge] JSON-RPC request: {json_rpc_request.get('method')}")
-    except json.JSONDecodeError as e:
-        return JSONResponse(
+        json_rpc_request = orjson.loads(body)
+        if logger.isEnabledFor(logging.DEBUG):
+            if isinstance(json_rpc_request, list):
+                logger.debug("[Bridge] JSON-RPC batch: %s", [r.get('method') if isinstance(r, dict) else r for r in json_rpc_request])
+            else:
+                logger.debug("[Bridge] JSON-RPC request: %s", json_rpc_request.get('method') if isinstance(json_rpc_request, dict) else json_rpc_request)
+    except orjson.JSONDecodeError as e:
+        return ORJSONResponse(
             {
                 "jsonrpc": "2.0",
                 "id": None,
@@ -234,40 +358,80 @@ async def _streamable_http_bridge_handler(request: Request, oauth_manager, upstr
         )
     
     try:
-        # Use the MCP bridge V2 to handle the request
-        response = await mcp_bridge_v2.handle_request(
-            user_id=user_id,
-            upstream_url=upstream_url,
-            access_token=access_token,
-            json_rpc_request=json_rpc_request
-        )
+        # Use the MCP bridge V2 to handle the request (or each request of a batch)
+        if isinstance(json_rpc_request, list):
+            if not json_rpc_request:
+                return ORJSONResponse(invalid_request(), status_code=400)
+            responses = await asyncio.gather(*(
+                _bridge_message(batch_request, user_id, upstream_url, access_token)
+                for batch_request in json_rpc_request
+            ))
+            # Notifications get no entry in the batch response
+            response = [r for r in responses if r is not None] or None
+        else:
+            error = _request_error(json_rpc_request)
+            if error is not None:
+                return ORJSONResponse(error, status_code=400)
+            response = await _bridge_message(json_rpc_request, user_id, upstream_url, access_token)
+        
+        if response is None:
+            # Only notifications were sent: accepted, with no body
+            return Response(status_code=202)
         
-        logger.debug(f"[Bridge] Got response, returning to client")
-        logger.debug(f"[Bridge] Response type: {type(response)}")
-        logger.debug(f"[Bridge] Response keys: {response.keys() if isinstance(response, dict) else 'not a dict'}")
+        logger.debug("[Bridge] Got response, returning to client")
+        logger.debug("[Bridge] Response type: %s", type(response))
+        logger.debug("[Bridge] Response keys: %s", response.keys() if isinstance(response, dict) else 'not a dict')
         
         # Return as JSON response
-        json_response = JSONResponse(
+        json_response = ORJSONResponse(
             content=response,
             media_type="application/json"
         )
-        logger.debug(f"[Bridge] Created JSONResponse, returning...")
+        logger.debug("[Bridge] Created ORJSONResponse, returning...")
         return json_response
     except Exception as e:
-        logger.error(f"[Bridge] Error creating response: {e}", exc_info=True)
+        logger.error("[Bridge] Error creating response: %s", e, exc_info=True)
         raise
 
 
-def register_proxy_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_url: str):
-    """Register proxy routes on the FastAPI app"""
+def register_proxy_routes(
+    app,
+    get_user_id_fn,
+    get_oauth_manager_fn,
+    upstream_url: str,
+    http_client: httpx.AsyncClient,
+    stream_client: httpx.AsyncClient,
+    max_sse_streams: int = 128,
+):
+    """
+    Register proxy routes on the FastAPI app.
+    All upstream requests share http_client so connections are pooled across requests;
+    long-lived SSE streams use stream_client so they don't hold connections from that pool,
+    and at most max_sse_streams of them are open upstream at a time.
+    """
+    sse_slots = asyncio.Semaphore(max_sse_streams)
+    # Parse the fixed upstream endpoints once instead of on every request
+    sse_url = httpx.URL(f"{upstream_url}/sse")
+    message_url = httpx.URL(f"{upstream_url}/message")
     
-    # Proxy SSE endpoint (without version prefix)
-    @app.api_route("/sse", methods=["GET", "POST"])
     async def proxy_sse(request: Request):
         """Proxy SSE connections to upstream MCP server"""
         user_id = get_user_id_fn(request)
         oauth_manager = get_oauth_manager_fn(user_id)
-        return await _proxy_sse_handler(request, oauth_manager, upstream_url)
+        return await _proxy_sse_handler(request, oauth_manager, sse_url, http_client, stream_client, sse_slots)
+    
+    async def proxy_message(request: Request):
+        """Proxy POST requests to upstream MCP server"""
+        user_id = get_user_id_fn(request)
+        oauth_manager = get_oauth_manager_fn(user_id)
+        return await _proxy_message_handler(request, oauth_manager, message_url, http_client)
+    
+    # Proxy SSE and message endpoints, with and without a version prefix
+    # (v1, v2, v3, etc. all map to the same upstream endpoints)
+    for path in ("/sse", "/v{version:int}/sse"):
+        app.add_api_route(path, proxy_sse, methods=["GET", "POST"])
+    for path in ("/message", "/v{version:int}/message"):
+        app.add_api_route(path, proxy_message, methods=["POST"])
 
     # Streamable HTTP bridge endpoint (for clients that only support streamable HTTP)
     @app.post("/mcp")
@@ -281,112 +445,50 @@ def register_proxy_routes(app, get_user_id_fn, get_oauth_manager_fn, upstream_ur
         return await _streamable_http_bridge_handler(request, oauth_manager, upstream_url, user_id)
     
     
-    # Proxy SSE endpoint (with version prefix - supports v1, v2, v3, etc.)
-    @app.api_route("/v{version:int}/sse", methods=["GET", "POST"])
-    async def proxy_sse_versioned(version: int, request: Request):
-        """Proxy SSE connections to upstream MCP server (versioned)"""
-        logger.debug(f"[SSE] Request for version v{version}")
-        user_id = get_user_id_fn(request)
-        oauth_manager = get_oauth_manager_fn(user_id)
-        return await _proxy_sse_handler(request, oauth_manager, upstream_url)
-    
-    
-    # Proxy POST endpoint for messages (without version prefix)
-    @app.post("/message")
-    async def proxy_message(request: Request):
-        """Proxy POST requests to upstream MCP server"""
-        user_id = get_user_id_fn(request)
-        oauth_manager = get_oauth_manager_fn(user_id)
-        return await _proxy_message_handler(request, oauth_manager, upstream_url)
-    
-    
-    # Proxy POST endpoint for messages (with version prefix - supports v1, v2, v3, etc.)
-    @app.post("/v{version:int}/message")
-    async def proxy_message_versioned(version: int, request: Request):
-        """Proxy POST requests to upstream MCP server (versioned)"""
-        logger.debug(f"[MESSAGE] Request for version v{version}")
-        user_id = get_user_id_fn(request)
-        oauth_manager = get_oauth_manager_fn(user_id)
-        return await _proxy_message_handler(request, oauth_manager, upstream_url)
-    
-    
     # Generic proxy for other endpoints
     @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
     async def proxy_all(request: Request, path: str):
         """Proxy all other requests to upstream MCP server"""
-        logger.debug(f"[PROXY_ALL] Incoming request: {request.method} {request.url.path} (captured path: {path})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[PROXY_ALL] Incoming request: %s %s (captured path: %s)", request.method, request.url.path, path)
         
         # Skip paths that have dedicated handlers
-        skip_paths = ["oauth/", "api/", "sse", "message", ""]
-        
-        # Check static skip paths
-        if any(path.startswith(p) if p.endswith("/") else path == p for p in skip_paths):
-            logger.debug(f"[PROXY_ALL] Skipping path: {path}")
+        if path in SKIP_EXACT_PATHS or path.startswith(SKIP_PATH_PREFIXES):
+            logger.debug("[PROXY_ALL] Skipping path: %s", path)
             raise HTTPException(status_code=404, detail="Not found")
         
         # Check versioned endpoints (v1/sse, v2/message, v99/sse, etc.)
-        if re.match(r'^v\d+/(sse|message)$', path):
-            logger.debug(f"[PROXY_ALL] Skipping versioned path: {path}")
+        if SKIP_VERSIONED_PATH.fullmatch(path):
+            logger.debug("[PROXY_ALL] Skipping versioned path: %s", path)
             raise HTTPException(status_code=404, detail="Not found")
         
         # Get user-specific oauth manager
         user_id = get_user_id_fn(request)
         oauth_manager = get_oauth_manager_fn(user_id)
         
-        # Check authentication
-        if not await check_auth_status(oauth_manager):
-            raise HTTPException(
-                status_code=401,
-                detail="Authentication required. Please visit http://localhost:8000/ to authenticate."
-            )
+        # Check authentication and get access token
+        access_token = await require_access_token(oauth_manager)
         
-        # Get access token
-        try:
-            access_token = await oauth_manager.get_valid_access_token()
-        except Exception as e:
-            raise HTTPException(status_code=401, detail=f"Authentication required: {e}")
+        headers = _forward_headers(request, access_token)
         
-        body = await request.body() if request.method in ["POST", "PUT", "PATCH"] else None
+        body = None
+        if request.method in BODY_METHODS and _has_body(request):
+            if _streams_body(request):
+                body = request.stream()
+                # Keep a known length so httpx doesn't switch the upstream request to chunked
+                if "content-length" in request.headers:
+                    headers["Content-Length"] = request.headers["content-length"]
+            else:
+                body = await request.body()
         
-        # Prepare headers with OAuth token
-        headers = {
-            k: v for k, v in request.headers.items() 
-            if k.lower() not in ["host", "content-length", "authorization"]
-        }
-        headers["Authorization"] = f"Bearer {access_token}"
+        response = await _send_upstream(
+            http_client, oauth_manager, access_token, headers,
+            request.method, f"{upstream_url}/{path}", content=body, params=request.query_params,
+        )
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            try:
-                response = await client.request(
-                    method=request.method,
-                    url=f"{upstream_url}/{path}",
-                    content=body,
-                    params=request.query_params,
-                    headers=headers,
-                )
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401:
-                    # Try refreshing token
-                    try:
-                        new_token = await oauth_manager.refresh_access_token()
-                        headers["Authorization"] = f"Bearer {new_token['access_token']}"
-                        response = await client.request(
-                            method=request.method,
-                            url=f"{upstream_url}/{path}",
-                            content=body,
-                            params=request.query_params,
-                            headers=headers,
-                        )
-                        response.raise_for_status()
-                    except Exception:
-                        raise HTTPException(status_code=401, detail="Authentication failed - please restart server")
-                else:
-                    raise
-            
-            return StreamingResponse(
-                iter([response.content]),
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type"),
-            )
-
+        return StreamingResponse(
+            response.aiter_bytes(),
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type"),
+            background=BackgroundTask(response.aclose),
+        )
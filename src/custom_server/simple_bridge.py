@@ -3,10 +3,12 @@ Simple HTTP-to-SSE Bridge
 Directly forwards Streamable HTTP requests to upstream SSE server without using MCP SDK
 """
 import asyncio
-import json
+import time
 import uuid
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Dict, Any, Optional
 import httpx
+import orjson
 
 from .logger import logger
 
@@ -14,8 +16,68 @@ from .logger import logger
 class SimpleBridge:
     """Simple bridge that forwards requests to upstream SSE server"""
     
-    def __init__(self):
-        self.sessions: Dict[str, str] = {}  # user_id -> session_id
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_sessions: int = 1024,
+        idle_ttl: float = 3600.0,
+    ):
+        # user_id -> session_id, in LRU order. At most max_sessions are kept, and
+        # sessions idle for longer than idle_ttl seconds are dropped on the next
+        # lookup; a dropped user just gets a new session ID.
+        self.sessions: "OrderedDict[str, str]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._max_sessions = max_sessions
+        self._idle_ttl = idle_ttl
+        # Shared across requests so upstream connections are reused; created on
+        # first use unless the caller passes its own
+        self._client = http_client
+        self._owns_client = http_client is None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """HTTP client for upstream requests, reused so its connections stay open between calls"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(60.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the HTTP client if this bridge created it"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _get_session_id(self, user_id: str) -> str:
+        """Return the session ID for user_id, creating one on first use"""
+        now = time.monotonic()
+        self._sweep(now)
+        self._last_used[user_id] = now
+        
+        session_id = self.sessions.get(user_id)
+        if session_id is not None:
+            self.sessions.move_to_end(user_id)
+            return session_id
+        
+        session_id = self.sessions[user_id] = str(uuid.uuid4())
+        logger.info(f"[SimpleBridge] Created session {session_id} for user {user_id}")
+        if len(self.sessions) > self._max_sessions:
+            evicted_user_id, _ = self.sessions.popitem(last=False)
+            del self._last_used[evicted_user_id]
+            logger.debug(f"[SimpleBridge] Evicted session for user {evicted_user_id}")
+        return session_id
+    
+    def _sweep(self, now: float):
+        """Drop idle sessions; the dict is in LRU order so only the head is checked"""
+        cutoff = now - self._idle_ttl
+        while self.sessions:
+            user_id = next(iter(self.sessions))
+            if self._last_used[user_id] > cutoff:
+                break
+            self.sessions.popitem(last=False)
+            del self._last_used[user_id]
+            logger.debug(f"[SimpleBridge] Expired idle session for user {user_id}")
     
     async def handle_request(
         self, 
@@ -30,12 +92,7 @@ class SimpleBridge:
         
         try:
             # Get or create session ID for this user
-            if user_id not in self.sessions:
-                session_id = str(uuid.uuid4())
-                self.sessions[user_id] = session_id
-                logger.info(f"[SimpleBridge] Created session {session_id} for user {user_id}")
-            else:
-                session_id = self.sessions[user_id]
+            session_id = self._get_session_id(user_id)
             
             logger.debug(f"[SimpleBridge] Forwarding {method} to upstream (session: {session_id})")
             
@@ -49,31 +106,30 @@ class SimpleBridge:
             }
             
             # Forward the request to upstream
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    message_url,
-                    params={"sessionId": session_id},
-                    json=json_rpc_request,
-                    headers=headers
-                )
-                
-                logger.debug(f"[SimpleBridge] Upstream response status: {response.status_code}")
-                
-                if response.status_code >= 400:
-                    logger.error(f"[SimpleBridge] Upstream error: {response.status_code} - {response.text}")
-                    return {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "error": {
-                            "code": -32603,
-                            "message": f"Upstream error: {response.text}"
-                        }
+            response = await self._get_client().post(
+                message_url,
+                params={"sessionId": session_id},
+                content=orjson.dumps(json_rpc_request),
+                headers=headers
+            )
+            
+            logger.debug(f"[SimpleBridge] Upstream response status: {response.status_code}")
+            
+            if response.status_code >= 400:
+                logger.error(f"[SimpleBridge] Upstream error: {response.status_code} - {response.text}")
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {
+                        "code": -32603,
+                        "message": f"Upstream error: {response.text}"
                     }
-                
-                # Parse and return response
-                response_data = response.json()
-                logger.debug(f"[SimpleBridge] Success: {method}")
-                return response_data
+                }
+            
+            # Parse and return response
+            response_data = orjson.loads(response.content)
+            logger.debug(f"[SimpleBridge] Success: {method}")
+            return response_data
         
         except httpx.TimeoutException as e:
             logger.error(f"[SimpleBridge] Timeout handling {method}: {e}")
@@ -98,8 +154,8 @@ class SimpleBridge:
     
     def clear_session(self, user_id: str):
         """Clear session for a user"""
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        self._last_used.pop(user_id, None)
+        if self.sessions.pop(user_id, None) is not None:
             logger.info(f"[SimpleBridge] Cleared session for user {user_id}")
 
 
@@ -0,0 +1,28 @@
+"""
+Tests for the app-level routes
+"""
+import os
+
+# app.py requires the upstream URL at import time
+os.environ.setdefault("UPSTREAM_MCP_URL", "https://mcp.example.com/v1")
+
+from custom_server.app import _etag_matches  # noqa: E402
+
+
+ETAG = '"abc"'
+
+
+def test_etag_matches_exact_and_weak_validators():
+    assert _etag_matches('"abc"', ETAG)
+    assert _etag_matches('W/"abc"', ETAG)
+
+
+def test_etag_matches_lists_and_wildcard():
+    assert _etag_matches('"x", W/"abc"', ETAG)
+    assert _etag_matches("*", ETAG)
+
+
+def test_etag_mismatch():
+    assert not _etag_matches(None, ETAG)
+    assert not _etag_matches('"x", "y"', ETAG)
+    assert not _etag_matches('"abcd"', ETAG)
@@ -0,0 +1,34 @@
+"""
+Tests for the authentication helpers used by the proxy routes
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from custom_server.auth import check_auth_status, require_access_token
+from custom_server.oauth_manager import OAuthManager
+
+
+def _manager(tmp_path) -> OAuthManager:
+    return OAuthManager("https://mcp.example.com/v1", config_dir=tmp_path, user_id="alice")
+
+
+def test_require_access_token_reads_tokens_saved_by_another_worker(tmp_path):
+    _manager(tmp_path).save_tokens({"access_token": "a", "expires_in": 3600})
+    manager = _manager(tmp_path)
+    # Cold managers must not fall back to the blocking file read
+    manager.load_tokens = None
+    
+    assert asyncio.run(require_access_token(manager)) == "a"
+
+
+def test_require_access_token_without_tokens_is_a_401(tmp_path):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(require_access_token(_manager(tmp_path)))
+    
+    assert excinfo.value.status_code == 401
+
+
+def test_check_auth_status_without_tokens(tmp_path):
+    assert asyncio.run(check_auth_status(_manager(tmp_path))) is False
@@ -0,0 +1,68 @@
+"""
+Tests for MCPBridge session creation, with the upstream SSE connect replaced by a stand-in
+"""
+import asyncio
+import contextlib
+
+import anyio
+
+from custom_server.mcp_bridge import MCPBridge
+
+
+UPSTREAM_URL = "https://mcp.example.com/v1"
+
+
+def _fake_connect(connects, delay=0.05):
+    """_connect stand-in that returns open stream pairs like sse_client does"""
+    async def connect(user_id, upstream_url, access_token):
+        connects.append(user_id)
+        await asyncio.sleep(delay)
+        read_writer, read = anyio.create_memory_object_stream(0)
+        write, write_reader = anyio.create_memory_object_stream(0)
+        session = object()
+        connect.ends[session] = (read_writer, write_reader)
+        return session, (read, write), contextlib.nullcontext()
+    connect.ends = {}
+    return connect
+
+
+def test_cancelled_connect_is_taken_over_by_waiters():
+    bridge = MCPBridge()
+    connects = []
+    bridge._connect = _fake_connect(connects)
+
+    async def run():
+        creator = asyncio.create_task(bridge.get_session("alice", UPSTREAM_URL, "token"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(bridge.get_session("alice", UPSTREAM_URL, "token")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # The client that started the connect goes away mid-handshake
+        creator.cancel()
+        sessions = await asyncio.gather(*waiters)
+        return creator, sessions
+
+    creator, sessions = asyncio.run(run())
+
+    assert creator.cancelled()
+    assert len(set(map(id, sessions))) == 1
+    assert connects == ["alice", "alice"]
+    assert bridge.session_futures == {}
+
+
+def test_closed_session_is_reconnected():
+    bridge = MCPBridge()
+    connects = []
+    bridge._connect = connect = _fake_connect(connects, delay=0)
+
+    async def run():
+        first = await bridge.get_session("alice", UPSTREAM_URL, "token")
+        assert await bridge.get_session("alice", UPSTREAM_URL, "token") is first
+        # The SSE reader stopping closes the writer end of the read stream
+        read_writer, _ = connect.ends[first]
+        await read_writer.aclose()
+        return first, await bridge.get_session("alice", UPSTREAM_URL, "token")
+
+    first, second = asyncio.run(run())
+
+    assert second is not first
+    assert connects == ["alice", "alice"]
@@ -0,0 +1,186 @@
+"""
+Tests for MCPBridgeV2 session handling, using a stand-in for the upstream MCP session
+"""
+import asyncio
+import hashlib
+
+from mcp import types
+
+from custom_server import mcp_bridge_v2 as bridge_module
+from custom_server.mcp_bridge_v2 import MCPBridgeV2
+
+
+UPSTREAM_URL = "https://mcp.example.com/v1"
+
+
+class _FakeClientSession:
+    """Answers the ClientSession calls the bridge makes"""
+    
+    def __init__(self):
+        self.release_call = asyncio.Event()
+        self.list_tools_calls = 0
+    
+    async def call_tool(self, name, arguments):
+        await self.release_call.wait()
+        return types.CallToolResult(content=[types.TextContent(type="text", text=name)])
+    
+    async def list_tools(self):
+        self.list_tools_calls += 1
+        return types.ListToolsResult(tools=[])
+
+
+class _FakeUpstreamSession(bridge_module._UpstreamSession):
+    """_UpstreamSession whose owner task opens a _FakeClientSession instead of an SSE connection"""
+    
+    closed = []
+    
+    async def _run(self):
+        self.session = _FakeClientSession()
+        self.init_result = types.InitializeResult(
+            protocolVersion="2025-06-18",
+            capabilities=types.ServerCapabilities(),
+            serverInfo=types.Implementation(name="fake", version="1"),
+        )
+        self._ready.set()
+        try:
+            await self._closing.wait()
+        finally:
+            _FakeUpstreamSession.closed.append(self)
+
+
+def _request(method, request_id=1, **params):
+    return {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+
+
+def test_token_change_waits_for_in_flight_calls(monkeypatch):
+    monkeypatch.setattr(bridge_module, "_UpstreamSession", _FakeUpstreamSession)
+    _FakeUpstreamSession.closed = []
+    bridge = MCPBridgeV2()
+    
+    async def run():
+        call = asyncio.create_task(bridge.handle_request("alice", UPSTREAM_URL, "old", _request("tools/call", name="slow")))
+        await asyncio.sleep(0.01)
+        old = bridge._sessions["alice"]
+        
+        # A refreshed token swaps in a new session without closing the busy one
+        listed = await bridge.handle_request("alice", UPSTREAM_URL, "new", _request("tools/list", 2))
+        assert bridge._sessions["alice"] is not old
+        assert old.alive and not _FakeUpstreamSession.closed
+        
+        old.session.release_call.set()
+        called = await call
+        await asyncio.sleep(0.01)
+        assert _FakeUpstreamSession.closed == [old]
+        await bridge.aclose()
+        return called, listed
+    
+    called, listed = asyncio.run(run())
+    
+    assert called["result"]["content"][0]["text"] == "slow"
+    assert listed["result"] == {"tools": []}
+
+
+def test_result_cache_is_capped_oldest_first(monkeypatch):
+    monkeypatch.setattr(bridge_module, "_UpstreamSession", _FakeUpstreamSession)
+    monkeypatch.setattr(bridge_module, "RESULT_CACHE_MAX_ENTRIES", 3)
+    bridge = MCPBridgeV2()
+    
+    async def run():
+        for user in range(5):
+            await bridge.handle_request(f"user{user}", UPSTREAM_URL, f"token{user}", _request("tools/list"))
+        keys = list(bridge._result_cache)
+        await bridge.aclose()
+        return keys
+    
+    keys = asyncio.run(run())
+    
+    assert len(keys) == 3
+    digests = [hashlib.blake2b(f"token{user}".encode(), digest_size=16).digest() for user in (2, 3, 4)]
+    assert [key[1] for key in keys] == digests
+
+
+class _FailingUpstreamSession(_FakeUpstreamSession):
+    """_FakeUpstreamSession whose upstream refuses the connection"""
+    
+    async def _run(self):
+        raise ConnectionRefusedError("upstream down")
+
+
+def test_failed_start_leaves_no_per_user_state(monkeypatch):
+    monkeypatch.setattr(bridge_module, "_UpstreamSession", _FailingUpstreamSession)
+    bridge = MCPBridgeV2()
+    
+    async def run():
+        responses = await asyncio.gather(*(
+            bridge.handle_request(f"user{n}", UPSTREAM_URL, "token", _request("tools/list"))
+            for n in range(3)
+        ))
+        await asyncio.sleep(0.01)
+        state = dict(bridge._sessions), set(bridge._retired)
+        await bridge.aclose()
+        return responses, state
+    
+    responses, (sessions, retired) = asyncio.run(run())
+    
+    assert all("upstream down" in response["error"]["message"] for response in responses)
+    assert sessions == {} and retired == set()
+
+
+def test_idle_sweep_closes_sessions_in_the_background(monkeypatch):
+    monkeypatch.setattr(bridge_module, "_UpstreamSession", _FakeUpstreamSession)
+    _FakeUpstreamSession.closed = []
+    bridge = MCPBridgeV2()
+    
+    async def run():
+        await bridge.handle_request("alice", UPSTREAM_URL, "token", _request("tools/list"))
+        idle = bridge._sessions["alice"]
+        idle.last_used -= bridge_module.SESSION_IDLE_TTL + 1
+        
+        # Another user's request doesn't wait on the sweep or the close
+        bridge._close_idle_sessions()
+        assert "alice" not in bridge._sessions and not _FakeUpstreamSession.closed
+        await bridge.handle_request("bob", UPSTREAM_URL, "token", _request("tools/list"))
+        await asyncio.sleep(0.01)
+        closed = list(_FakeUpstreamSession.closed)
+        await bridge.aclose()
+        return idle, closed
+    
+    idle, closed = asyncio.run(run())
+    
+    assert closed == [idle]
+
+
+class _SlowStartUpstreamSession(_FakeUpstreamSession):
+    """_FakeUpstreamSession that takes a while to connect"""
+    
+    starts = 0
+    
+    async def _run(self):
+        _SlowStartUpstreamSession.starts += 1
+        await asyncio.sleep(0.05)
+        await super()._run()
+
+
+def test_concurrent_requests_share_one_start(monkeypatch):
+    monkeypatch.setattr(bridge_module, "_UpstreamSession", _SlowStartUpstreamSession)
+    _SlowStartUpstreamSession.starts = 0
+    bridge = MCPBridgeV2()
+    
+    async def run():
+        first = asyncio.create_task(bridge.handle_request("alice", UPSTREAM_URL, "token", _request("tools/list")))
+        await asyncio.sleep(0.01)
+        others = [
+            asyncio.create_task(bridge.handle_request("alice", UPSTREAM_URL, "token", _request("tools/list", n)))
+            for n in (2, 3)
+        ]
+        await asyncio.sleep(0.01)
+        # The request that started the connect going away doesn't abort it for the others
+        first.cancel()
+        responses = await asyncio.gather(*others)
+        await bridge.aclose()
+        return responses
+    
+    responses = asyncio.run(run())
+    
+    assert [response["result"] for response in responses] == [{"tools": []}] * 2
+    assert _SlowStartUpstreamSession.starts == 1
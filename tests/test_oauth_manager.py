@@ -0,0 +1,128 @@
+"""
+Tests for OAuthManager token persistence
+"""
+import asyncio
+import time
+
+import pytest
+
+from custom_server.oauth_manager import OAuthManager, OAuthManagerStore
+
+
+def _manager(tmp_path) -> OAuthManager:
+    return OAuthManager("https://mcp.example.com/v1", config_dir=tmp_path, user_id="alice")
+
+
+def test_save_tokens_async_writes_in_the_background_until_close(tmp_path):
+    manager = _manager(tmp_path)
+    
+    async def save_then_close():
+        await manager._save_tokens_async({"access_token": "a", "expires_in": 3600})
+        written_before_close = manager._get_file_path("tokens.json").exists()
+        await manager.close()
+        return written_before_close
+    
+    assert asyncio.run(save_then_close()) is False
+    assert manager.tokens["access_token"] == "a"
+    assert manager._load_json("tokens.json")["access_token"] == "a"
+
+
+def test_clear_credentials_during_save_leaves_no_tokens(tmp_path):
+    manager = _manager(tmp_path)
+    
+    async def save_then_clear():
+        await manager._save_tokens_async({"access_token": "a"})
+        # Let the background write reach its worker thread before logging out
+        await asyncio.sleep(0)
+        await manager.clear_credentials()
+        await manager.close()
+    
+    asyncio.run(save_then_clear())
+    
+    assert manager.tokens is None
+    assert not manager._get_file_path("tokens.json").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_superseded_write_is_not_renamed_into_place(tmp_path):
+    manager = _manager(tmp_path)
+    
+    manager._save_json("tokens.json", {"access_token": "a"}, still_current=lambda: False)
+    
+    assert not manager._get_file_path("tokens.json").exists()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_preload_reads_saved_tokens_and_client_info(tmp_path):
+    _manager(tmp_path).save_tokens({"access_token": "a", "expires_in": 3600})
+    _manager(tmp_path).save_client_info({"client_id": "cid"})
+    manager = _manager(tmp_path)
+    
+    asyncio.run(manager.preload())
+    
+    assert manager.tokens["access_token"] == "a"
+    assert manager.client_info == {"client_id": "cid"}
+
+
+def test_failed_refresh_backs_off_ahead_of_time_refreshes(tmp_path):
+    manager = _manager(tmp_path)
+    manager.save_tokens({"access_token": "a", "refresh_token": "r", "expires_in": 60})
+    calls = []
+    
+    async def failing_refresh():
+        calls.append(1)
+        raise Exception("invalid_grant")
+    manager._refresh_access_token = failing_refresh
+    
+    async def refresh_twice():
+        with pytest.raises(Exception):
+            await manager.refresh_if_expiring(300)
+        return await manager.refresh_if_expiring(300)
+    
+    assert asyncio.run(refresh_twice()) is False
+    assert len(calls) == 1
+    
+    # Once the backoff has passed, the next pass tries again
+    manager._refresh_retry_at = time.monotonic() - 1
+    with pytest.raises(Exception):
+        asyncio.run(manager.refresh_if_expiring(300))
+    assert len(calls) == 2
+
+
+def test_snapshot_drops_idle_managers(tmp_path):
+    store = OAuthManagerStore(lambda user_id: OAuthManager("https://mcp.example.com/v1", config_dir=tmp_path, user_id=user_id), idle_ttl=60)
+    store.get_or_create("alice")
+    store.get_or_create("bob")
+    store._last_used["alice"] -= 120
+    
+    assert [manager.user_id for manager in store.snapshot()] == ["bob"]
+
+
+def test_prepare_auth_state_reads_state_saved_by_another_worker(tmp_path):
+    starter = _manager(tmp_path)
+    starter.save_auth_state()
+    manager = _manager(tmp_path)
+    
+    asyncio.run(manager.prepare_auth_state())
+    
+    assert (manager.state, manager.code_verifier, manager.code_challenge) == (
+        starter.state, starter.code_verifier, starter.code_challenge
+    )
+
+
+def test_redirect_url_from_untrusted_host_is_not_used(tmp_path):
+    manager = _manager(tmp_path)
+    default = manager.redirect_uri
+    
+    manager.resolve_redirect_url("https://attacker.example/oauth/callback", frozenset({"localhost"}))
+    
+    assert manager.redirect_uri == default
+    assert manager.client_metadata["redirect_uris"] == [default]
+
+
+def test_redirect_url_from_trusted_host_is_used(tmp_path):
+    manager = _manager(tmp_path)
+    
+    manager.resolve_redirect_url("https://proxy.example/oauth/callback", frozenset({"proxy.example"}))
+    
+    assert manager.redirect_uri == "https://proxy.example/oauth/callback"
@@ -0,0 +1,217 @@
+"""
+Tests for the proxy handlers: the SSE relay and the Streamable HTTP bridge
+"""
+import asyncio
+
+import httpx
+import orjson
+import pytest
+from sse_starlette.sse import AppStatus
+from starlette.requests import Request
+
+from custom_server import proxy
+
+
+SSE_URL = httpx.URL("https://mcp.example.com/v1/sse")
+
+
+@pytest.fixture(autouse=True)
+def _reset_sse_exit_event():
+    # sse-starlette keeps one exit event per process, bound to the loop that made it;
+    # each test runs its own loop
+    AppStatus.should_exit_event = None
+
+
+class _Manager:
+    """Stands in for an authenticated OAuthManager"""
+    tokens = {"access_token": "token"}
+    
+    async def get_valid_access_token(self) -> str:
+        return "token"
+
+
+class _ChunkStream(httpx.AsyncByteStream):
+    """Upstream SSE body delivered as the given reads"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _stream_client(chunks) -> httpx.AsyncClient:
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_ChunkStream(chunks))
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _sse_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/sse", "headers": [], "query_string": b""})
+
+
+async def _relay(chunks) -> list:
+    """Run GET /sse against an upstream sending chunks and return the body frames sent to the client"""
+    async with _stream_client(chunks) as stream_client:
+        response = await proxy._proxy_sse_handler(
+            _sse_request(), _Manager(), SSE_URL, None, stream_client, asyncio.Semaphore(1)
+        )
+        frames = []
+        
+        async def send(message):
+            if message["type"] == "http.response.body" and message["body"]:
+                frames.append(message["body"])
+        
+        async def receive():
+            await asyncio.Event().wait()
+        
+        await response({"type": "http"}, receive, send)
+        return frames
+
+
+def test_last_event_end():
+    assert proxy._last_event_end(bytearray(b"data: x"), 0) == 0
+    assert proxy._last_event_end(bytearray(b"\n\ndata: x"), 0) == 2
+    assert proxy._last_event_end(bytearray(b"data: a\r\n\r\ndata: b\n\ndata: c"), 0) == 20
+    assert proxy._last_event_end(bytearray(b"data: a\r\rdata: b"), 0) == 9
+
+
+def test_event_split_across_reads_is_relayed_whole():
+    frames = asyncio.run(_relay([b'event: message\ndata: {"a":', b'1}\n\n', b'data: x']))
+    
+    assert frames == [b'event: message\ndata: {"a":1}\n\n', b"data: x"]
+
+
+def test_separator_split_across_reads():
+    frames = asyncio.run(_relay([b"data: a\r\n", b"\r", b"\ndata: b\n", b"\n"]))
+    
+    assert frames == [b"data: a\r\n\r\n", b"data: b\n\n"]
+
+
+def test_several_events_in_one_read_are_sent_together():
+    frames = asyncio.run(_relay([b"data: a\n\ndata: b\n\ndata: c", b"\n\n"]))
+    
+    assert frames == [b"data: a\n\ndata: b\n\n", b"data: c\n\n"]
+
+
+async def _fake_handle_request(user_id, upstream_url, access_token, json_rpc_request):
+    return {"jsonrpc": "2.0", "id": json_rpc_request["id"], "result": {"method": json_rpc_request["method"]}}
+
+
+def _bridge(monkeypatch, payload, handle_request=_fake_handle_request):
+    """POST payload to the /mcp bridge handler and return (status, decoded body or None)"""
+    monkeypatch.setattr(proxy.mcp_bridge_v2, "handle_request", handle_request)
+    body = orjson.dumps(payload)
+    
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    async def run():
+        request = Request({"type": "http", "method": "POST", "path": "/mcp", "headers": [], "query_string": b""}, receive)
+        return await proxy._streamable_http_bridge_handler(request, _Manager(), "https://mcp.example.com/v1", "alice")
+    
+    response = asyncio.run(run())
+    return response.status_code, orjson.loads(response.body) if response.body else None
+
+
+def test_bridge_batch_returns_a_response_per_request(monkeypatch):
+    status, body = _bridge(monkeypatch, [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 2, "method": "prompts/list"},
+    ])
+    
+    assert status == 200
+    assert [r["id"] for r in body] == [1, 2]
+
+
+def test_bridge_empty_batch_is_a_single_invalid_request(monkeypatch):
+    status, body = _bridge(monkeypatch, [])
+    
+    assert status == 400
+    assert body == {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+
+
+def test_bridge_invalid_batch_entries_get_their_own_errors(monkeypatch):
+    status, body = _bridge(monkeypatch, [1, {"jsonrpc": "2.0", "id": 7}, {"jsonrpc": "2.0", "id": 8, "method": "tools/list"}])
+    
+    assert status == 200
+    assert [(r["id"], r.get("error", {}).get("code")) for r in body] == [(None, -32600), (7, -32600), (8, None)]
+
+
+def test_bridge_batch_drops_notification_responses(monkeypatch):
+    status, body = _bridge(monkeypatch, [
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+    ])
+    
+    assert status == 200
+    assert [r["id"] for r in body] == [1]
+
+
+def test_bridge_notifications_only_get_no_body(monkeypatch):
+    assert _bridge(monkeypatch, [{"jsonrpc": "2.0", "method": "notifications/initialized"}]) == (202, None)
+    assert _bridge(monkeypatch, {"jsonrpc": "2.0", "method": "notifications/initialized"}) == (202, None)
+
+
+def test_bridge_notifications_are_not_forwarded(monkeypatch):
+    forwarded = []
+    
+    async def recording_handle_request(user_id, upstream_url, access_token, json_rpc_request):
+        forwarded.append(json_rpc_request)
+        return await _fake_handle_request(user_id, upstream_url, access_token, json_rpc_request)
+    
+    status, body = _bridge(monkeypatch, [
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 1}},
+    ], recording_handle_request)
+    
+    assert (status, body) == (202, None)
+    assert forwarded == []
+
+
+def test_bridge_invalid_single_request(monkeypatch):
+    status, body = _bridge(monkeypatch, 1)
+    
+    assert status == 400
+    assert body["error"]["code"] == -32600
+
+
+class _EndlessStream(httpx.AsyncByteStream):
+    """Upstream SSE body that never ends on its own"""
+    
+    def __init__(self):
+        self.closed = False
+    
+    async def __aiter__(self):
+        while True:
+            yield b"data: tick\n\n"
+    
+    async def aclose(self):
+        self.closed = True
+
+
+def test_client_disconnect_releases_the_sse_slot():
+    upstream_body = _EndlessStream()
+    
+    def handler(request):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=upstream_body)
+    
+    async def run():
+        slots = asyncio.Semaphore(1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as stream_client:
+            response = await proxy._proxy_sse_handler(_sse_request(), _Manager(), SSE_URL, None, stream_client, slots)
+            
+            # A slow client, so the relay is usually parked at a yield when the disconnect lands
+            async def send(message):
+                await asyncio.sleep(0.005)
+            
+            async def receive():
+                await asyncio.sleep(0.05)
+                return {"type": "http.disconnect"}
+            
+            await response({"type": "http"}, receive, send)
+        return slots.locked()
+    
+    assert asyncio.run(run()) is False
+    assert upstream_body.closed